@@ -0,0 +1,63 @@
+"""Shared fixtures: a small synthetic resource set (see tools/synthetic.py) with config pointed at it, and the
+output of the eager, serial build that the other modes are compared against"""
+
+import os
+import sys
+
+import pytest
+
+# tools/ is a flat directory of modules that import each other by name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+
+import config
+import SemLink
+import benchmark
+import synthetic
+import decision_log
+
+
+@pytest.fixture(scope="session")
+def resources(tmp_path_factory):
+    return synthetic.generate(str(tmp_path_factory.mktemp("resources")), lemmas=40, instances=2000)
+
+
+@pytest.fixture(autouse=True)
+def synthetic_config(resources, tmp_path, monkeypatch):
+    """Config pointed at the synthetic resources, with caches in a fresh directory for every test"""
+    cache_dir = str(tmp_path / "cache")
+    old = benchmark.use_synthetic_config(resources, cache_dir)
+    monkeypatch.setattr(config, "PB_FN_JOIN_PATH", os.path.join(cache_dir, "pb_vn_fn.join"))
+    yield cache_dir
+    benchmark.restore_config(old)
+
+
+def new_semlink(resources, filename=None, **kwargs):
+    """A SemLink on the synthetic resources, keeping its decisions in memory"""
+    filename = resources["instances"] if filename is None else filename
+    return SemLink.SemLink(filename, vn_path=resources["vn"], pb_path=resources["pb"], on_path=resources["on"],
+                           version="2.0", decisions=decision_log.DecisionLog(), **kwargs)
+
+
+def update(semlink):
+    semlink.update_verbnet_from_propbank()
+    semlink.update_framenet_from_mappings()
+    semlink.update_dependencies()
+    return semlink
+
+
+def read_lines(filename):
+    with open(filename) as f:
+        return f.read().splitlines()
+
+
+@pytest.fixture(scope="session")
+def reference_lines(resources, tmp_path_factory):
+    """Output lines of the eager, serial, dict based build"""
+    directory = tmp_path_factory.mktemp("reference")
+    old = benchmark.use_synthetic_config(resources, str(directory / "cache"))
+    try:
+        output = str(directory / "semlink.out")
+        update(new_semlink(resources)).write(output)
+    finally:
+        benchmark.restore_config(old)
+    return read_lines(output)
@@ -0,0 +1,75 @@
+import pytest
+
+import annotation
+import annotation_index
+import annotation_store
+
+from conftest import new_semlink, read_lines
+
+
+def test_sort_key_orders_numerically():
+    instances = ["wsj_0010.mrg 0 1", "wsj_0002.mrg 10 0", "wsj_0002.mrg 2 3", "cctv_0001.mrg 0 5"]
+    assert sorted(instances, key=lambda instance: annotation.instance_sort_key(*instance.split())) == \
+        ["cctv_0001.mrg 0 5", "wsj_0002.mrg 2 3", "wsj_0002.mrg 10 0", "wsj_0010.mrg 0 1"]
+
+
+@pytest.mark.parametrize("sentence_no, token_no", [(1 << annotation.NUMBER_BITS, 0), (0, 1 << annotation.NUMBER_BITS),
+                                                   (-1, 0)])
+def test_sort_key_overflow(sentence_no, token_no):
+    with pytest.raises(ValueError):
+        annotation.instance_sort_key("wsj_0001.mrg", sentence_no, token_no)
+
+
+def test_sort_key_largest_numbers():
+    largest = (1 << annotation.NUMBER_BITS) - 1
+    assert annotation.instance_sort_key("wsj_0001.mrg", largest, largest) < \
+        annotation.instance_sort_key("wsj_0002.mrg", 0, 0)
+
+
+def test_store_matches_dict(resources):
+    annotations = new_semlink(resources).annotations
+    store = annotation_store.AnnotationStore(annotations.values())
+    assert len(store) == len(annotations)
+    for instance, ann in annotations.items():
+        assert store[instance].writable() == ann.writable()
+        assert store[instance].sort_key() == ann.sort_key()
+
+
+def test_store_out_of_range_instance():
+    store = annotation_store.AnnotationStore()
+    store["wsj_0001.mrg 0 1"] = annotation.SemLinkAnnotation("wsj_0001.mrg 0 1 gold shake-v 26.5 None None None")
+    assert "wsj_0001.mrg %d 1" % (1 << annotation.NUMBER_BITS) not in store
+    assert "wsj_0001.mrg x 1" not in store
+    with pytest.raises(ValueError):
+        store["wsj_0001.mrg %d 1" % (1 << annotation.NUMBER_BITS)] = \
+            annotation.SemLinkAnnotation("wsj_0001.mrg 0 1 gold shake-v 26.5 None None None")
+
+
+def test_index_query(resources):
+    annotations = new_semlink(resources).annotations
+    index = annotation_index.AnnotationIndex(annotations)
+    ann = next(iter(annotations.values()))
+    expected = {instance for instance, other in annotations.items()
+                if other.verb == ann.verb and other.vn_class == ann.vn_class}
+    assert index.query(verb=ann.verb, vn_class=ann.vn_class) == expected
+
+    old_class, ann.vn_class = ann.vn_class, "0.0"
+    index.add(ann.instance, ann)
+    assert index.query(vn_class="0.0") == {ann.instance}
+    assert index.query(verb=ann.verb, vn_class=old_class) == expected - {ann.instance}
+
+
+def test_ordered_write_after_changes(resources, tmp_path):
+    semlink = new_semlink(resources)
+    semlink.write(str(tmp_path / "first"))
+    removed = next(iter(semlink.annotations))
+    del semlink.annotations[removed]
+    semlink.add_annotation(annotation.SemLinkAnnotation("aaa_0001.mrg 0 0 gold shake-v 26.5 None None None"))
+    semlink.write(str(tmp_path / "second"))
+
+    lines = read_lines(str(tmp_path / "second"))
+    keys = [" ".join(line.split()[:3]) for line in lines]
+    assert keys[0] == "aaa_0001.mrg 0 0"
+    assert removed not in keys
+    assert keys == sorted(keys, key=lambda instance: annotation.instance_sort_key(*instance.split()))
+    assert len(lines) == len(read_lines(str(tmp_path / "first")))
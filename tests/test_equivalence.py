@@ -0,0 +1,78 @@
+"""Every alternative build path writes what the eager, serial build writes"""
+
+import instance_file
+import ontonotes
+import verbnet
+import vnfn
+
+from conftest import new_semlink, update, read_lines
+
+
+def test_reference_is_sorted_and_unique(reference_lines):
+    keys = [" ".join(line.split()[:3]) for line in reference_lines]
+    assert len(keys) == len(set(keys))
+    assert reference_lines
+
+
+def test_snapshot(resources, reference_lines, tmp_path):
+    # The first build writes the VerbNet snapshot, the second loads it
+    update(new_semlink(resources))
+    output = str(tmp_path / "out")
+    update(new_semlink(resources)).write(output)
+    assert read_lines(output) == reference_lines
+
+
+def test_columnar(resources, reference_lines, tmp_path):
+    output = str(tmp_path / "out")
+    update(new_semlink(resources, columnar=True)).write(output)
+    assert read_lines(output) == reference_lines
+
+
+def test_parallel(resources, reference_lines, tmp_path):
+    output = str(tmp_path / "out")
+    semlink = new_semlink(resources)
+    semlink.update_parallel(2)
+    semlink.write(output)
+    assert read_lines(output) == reference_lines
+
+
+def test_streaming(resources, reference_lines, tmp_path):
+    output = str(tmp_path / "out")
+    new_semlink(resources, filename=False).stream(resources["instances"], output, deduplicate=True)
+    assert sorted(read_lines(output)) == sorted(reference_lines)
+
+
+def test_streaming_keeps_every_line(resources, tmp_path):
+    output = str(tmp_path / "out")
+    new_semlink(resources, filename=False).stream(resources["instances"], output)
+    assert len(read_lines(output)) == len([line for line in read_lines(resources["instances"]) if line.strip()])
+
+
+def test_lazy_verbnet(resources, reference_lines, tmp_path):
+    output = str(tmp_path / "out")
+    semlink = new_semlink(resources)
+    semlink.vno = verbnet.VerbNetParser(directory=resources["vn"], lazy=True, lazy_cache_size=4)
+    vnfn.use_verbnet(semlink.vno)
+    update(semlink).write(output)
+    assert read_lines(output) == reference_lines
+
+
+def test_eager_ontonotes(resources, reference_lines, tmp_path):
+    # SemLink loads OntoNotes lazily, so the reference build is the lazy one here
+    output = str(tmp_path / "out")
+    semlink = new_semlink(resources)
+    semlink.ono = ontonotes.OntoNotesParser(resources["on"])
+    semlink.update_ontonotes_from_release(resources["on_release"])
+    lazy = new_semlink(resources)
+    lazy.update_ontonotes_from_release(resources["on_release"])
+    semlink.write(output)
+    lazy.write(output + ".lazy")
+    assert read_lines(output) == read_lines(output + ".lazy")
+
+
+def test_binary(resources, reference_lines, tmp_path):
+    semlink = update(new_semlink(resources))
+    binary, text = str(tmp_path / "out.bin"), str(tmp_path / "out")
+    semlink.write_binary(binary)
+    instance_file.binary_to_text(binary, text)
+    assert read_lines(text) == reference_lines
@@ -0,0 +1,19 @@
+import json
+
+import framenet_index
+
+
+def test_lookup_ignores_case(resources):
+    index = framenet_index.FrameNetLemmaIndex(resources["fn_lemmas"])
+    with open(resources["fn_lemmas"]) as f:
+        lemma, frames = next(iter(json.load(f).items()))
+    assert index.frame_names_by_lemma(lemma.upper()) == frozenset(frames)
+    assert index.frame_names_by_lemma("no such lemma") == frozenset()
+
+
+def test_mixed_case_index_file_merged(tmp_path):
+    path = str(tmp_path / "lemmas.json")
+    with open(path, "w") as f:
+        json.dump({"Shake": ["Body_movement"], "shake": ["Cause_to_move"]}, f)
+    index = framenet_index.FrameNetLemmaIndex(path)
+    assert index.frame_names_by_lemma("shake") == {"Body_movement", "Cause_to_move"}
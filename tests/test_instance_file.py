@@ -0,0 +1,45 @@
+import annotation
+import instance_file
+
+from conftest import read_lines
+
+LINES = [
+    "wsj_0002.mrg 3 4 gold shake-v 26.5 Body_movement shake.01 1 0:1-ARG0=Agent",
+    "wsj_0001.mrg 0 8 gold rock-v 26.5 None rock.01 None None",
+    "cctv_0002.mrg 1 1 gold shake-v None None shake.01 2 None",
+]
+
+
+def write_text(path, lines):
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def test_round_trip_in_key_order(tmp_path):
+    text, binary, back = str(tmp_path / "in"), str(tmp_path / "in.bin"), str(tmp_path / "out")
+    write_text(text, LINES)
+    instance_file.text_to_binary(text, binary)
+    instance_file.binary_to_text(binary, back)
+    expected = sorted((annotation.SemLinkAnnotation(line) for line in LINES), key=lambda ann: ann.sort_key())
+    assert read_lines(back) == [ann.writable() for ann in expected]
+
+
+def test_lookup(tmp_path):
+    text, binary = str(tmp_path / "in"), str(tmp_path / "in.bin")
+    write_text(text, LINES)
+    instance_file.text_to_binary(text, binary)
+    with instance_file.InstanceFile(binary) as instances:
+        assert instances["wsj_0002.mrg 3 4"].dependencies == ["0:1-ARG0=Agent"]
+        assert instances["wsj_0001.mrg 0 8"].verb == "rock"
+        assert "wsj_0001.mrg 0 9" not in instances
+        assert "wsj_0001.mrg %d 8" % (1 << annotation.NUMBER_BITS) not in instances
+        assert [ann.instance for ann in instances.scan_document("cctv_0002.mrg")] == ["cctv_0002.mrg 1 1"]
+
+
+def test_duplicate_keys_keep_last(tmp_path):
+    text, binary = str(tmp_path / "in"), str(tmp_path / "in.bin")
+    write_text(text, LINES + ["wsj_0001.mrg 0 8 gold rock-v 45.6 None rock.01 None None"])
+    instance_file.text_to_binary(text, binary)
+    with instance_file.InstanceFile(binary) as instances:
+        assert len(instances) == len(LINES)
+        assert instances["wsj_0001.mrg 0 8"].vn_class == "45.6"
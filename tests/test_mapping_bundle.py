@@ -0,0 +1,71 @@
+import os
+import shutil
+
+import pytest
+
+import vnfn
+import propbank
+import mapping_bundle
+
+
+@pytest.fixture
+def sources(resources, tmp_path):
+    """Copies of the synthetic mapping files, free to be changed by a test"""
+    copies = {}
+    for name, path in mapping_bundle.configured_sources().items():
+        copies[name] = str(tmp_path / os.path.basename(path))
+        shutil.copy(path, copies[name])
+    return copies
+
+
+def test_sections_match_source_files(sources, tmp_path):
+    bundle = mapping_bundle.load_bundle(str(tmp_path / "bundle"), sources)
+    external = propbank.ExternalVnPbMapping(sources["external_vn2pb"])
+    assert dict(bundle["numerical_pb2vn"]) == external.numerical_pb2vn
+    assert dict(bundle["vn2pb"]) == external.vn2pb
+    assert dict(bundle["vn_fn"]) == vnfn.load_mappings(sources["vn_fn"])
+    assert dict(bundle["vn_fn_roles"]) == vnfn.load_element_mappings(mapping_file=sources["vn_fn_roles"])
+    assert "no such key" not in bundle["vn_fn"]
+
+
+def test_stale_source_rebuilds(sources, tmp_path):
+    bundle_path = str(tmp_path / "bundle")
+    bundle = mapping_bundle.load_bundle(bundle_path, sources)
+    with open(sources["vn_fn"]) as f:
+        text = f.read()
+    with open(sources["vn_fn"], "w") as f:
+        f.write(text.replace("Frame0", "Changed"))
+    assert not bundle.is_current(sources)
+
+    mapping_bundle.bundles.clear()
+    rebuilt = mapping_bundle.load_bundle(bundle_path, sources)
+    assert dict(rebuilt["vn_fn"]) == vnfn.load_mappings(sources["vn_fn"])
+    assert rebuilt.is_current(sources)
+
+
+def test_cache_keyed_by_sources(sources, tmp_path):
+    bundle_path = str(tmp_path / "bundle")
+    full = mapping_bundle.load_bundle(bundle_path, sources)
+    partial_sources = dict(sources, vn_fn=str(tmp_path / "missing.s"))
+    partial = mapping_bundle.load_bundle(bundle_path, partial_sources)
+    assert partial is not full
+    assert mapping_bundle.load_bundle(bundle_path, sources) is full
+    assert mapping_bundle.load_bundle(bundle_path, dict(partial_sources)) is partial
+
+
+def test_missing_source_skipped(sources, tmp_path):
+    os.remove(sources["vn_fn"])
+    bundle = mapping_bundle.load_bundle(str(tmp_path / "bundle"), sources)
+    assert len(bundle.external_vn_pb().pb2vn) > 0
+    with pytest.raises(KeyError):
+        bundle["vn_fn"]
+
+
+def test_value_cache_bounded(sources, tmp_path):
+    section = mapping_bundle.load_bundle(str(tmp_path / "bundle"), sources)["vn_fn"]
+    section.cache_size = 3
+    keys = list(section)
+    assert len(keys) > 3
+    values = [section[key] for key in keys]
+    assert len(section.values) == 3
+    assert [section[key] for key in keys] == values
@@ -0,0 +1,50 @@
+import os
+import shutil
+
+import pytest
+
+import ontonotes
+
+
+def groupings(parser, lemmas):
+    return {lemma: {n: (on_sense.ID, on_sense.pb_rolesets(), on_sense.vn_classes())
+                    for n, on_sense in parser.lemma_groupings(lemma).items()} for lemma in lemmas}
+
+
+def test_lazy_matches_eager(resources):
+    eager = ontonotes.OntoNotesParser(resources["on"])
+    lazy = ontonotes.OntoNotesParser(resources["on"], lazy=True)
+    lemma = next(iter(eager.lemma_index))
+    assert groupings(lazy, [lemma]) == groupings(eager, [lemma])
+    assert len(lazy.lemma_index) == 1
+    assert groupings(lazy, eager.lemma_index) == groupings(eager, eager.lemma_index)
+
+
+def test_index_queries(resources):
+    eager = ontonotes.OntoNotesParser(resources["on"])
+    lazy = ontonotes.OntoNotesParser(resources["on"], lazy=True)
+    on_sense = next(iter(eager.groupings.values()))
+    roleset = on_sense.pb_rolesets()[0]
+    assert [s.ID for s in lazy.groupings_for(pb=roleset)] == [s.ID for s in eager.groupings_for(pb=roleset)]
+    assert on_sense.ID in [s.ID for s in eager.groupings_for(pb=roleset)]
+
+
+def test_lazy_renamed_file(resources, tmp_path):
+    directory = str(tmp_path / "on")
+    shutil.copytree(resources["on"], directory)
+    fname = sorted(os.listdir(directory))[0]
+    os.rename(os.path.join(directory, fname), os.path.join(directory, "renamed.xml"))
+    lemma = fname[:-len(".xml")]
+    eager = ontonotes.OntoNotesParser(directory)
+    lazy = ontonotes.OntoNotesParser(directory, lazy=True)
+    assert groupings(lazy, [lemma]) == groupings(eager, [lemma])
+    assert groupings(lazy, [lemma])[lemma]
+
+
+def test_lazy_file_without_lemma(tmp_path):
+    path = tmp_path / "zz-v.xml"
+    path.write_text('<?xml version="1.0"?>\n<inventory>\n<sense n="1" name="x" group="1"><mappings><pb>zz.01</pb>'
+                    '</mappings></sense></inventory>\n')
+    with pytest.warns(UserWarning):
+        lazy = ontonotes.OntoNotesParser(str(tmp_path), lazy=True)
+    assert lazy.get_grouping("zz-v", "1").pb_rolesets() == ["zz.01"]
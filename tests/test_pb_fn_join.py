@@ -0,0 +1,45 @@
+import json
+
+import pb_fn_join
+
+
+def fresh(resources, pb_vn_path):
+    return pb_fn_join.PbFnJoin(cache_path=False, pb_vn_path=pb_vn_path, vn_fn_path=resources["vn_fn_json"],
+                               roles_path=resources["vn_fn_roles"])
+
+
+def test_join(resources):
+    join = fresh(resources, resources["pb_vn"])
+    with open(resources["pb_vn"]) as f:
+        pb_vn = json.load(f)
+    assert set(join) == set(pb_vn)
+    roleset, vn_classes = next(iter(pb_vn.items()))
+    vn_class, args = next(iter(vn_classes.items()))
+    chains = join[roleset]
+    assert chains and all(chain[0] == vn_class for chain in chains)
+    assert set(chains[0][2]) == set(args)
+    assert join["not.01"] == []
+
+
+def test_subclass_uses_ancestor_roles():
+    roles = {"10.1;Frame0": {"agent": "Agent"}}
+    assert pb_fn_join.role_mapping(roles, "10.1-1-2", "Frame0") == {"agent": "Agent"}
+    assert pb_fn_join.role_mapping(roles, "10.2", "Frame0") == {}
+
+
+def test_incremental_update(resources, tmp_path):
+    pb_vn_path, cache_path = str(tmp_path / "pb-vn2.json"), str(tmp_path / "join")
+    with open(resources["pb_vn"]) as f:
+        pb_vn = json.load(f)
+    with open(pb_vn_path, "w") as f:
+        json.dump(pb_vn, f)
+    first = pb_fn_join.PbFnJoin(cache_path, pb_vn_path, resources["vn_fn_json"], resources["vn_fn_roles"])
+    assert first.rejoined == set(pb_vn)
+
+    roleset = sorted(pb_vn)[0]
+    pb_vn[roleset] = {cls: {arg: "patient" for arg in args} for cls, args in pb_vn[roleset].items()}
+    with open(pb_vn_path, "w") as f:
+        json.dump(pb_vn, f)
+    second = pb_fn_join.PbFnJoin(cache_path, pb_vn_path, resources["vn_fn_json"], resources["vn_fn_roles"])
+    assert second.rejoined == {roleset}
+    assert second.table == fresh(resources, pb_vn_path).table
@@ -0,0 +1,87 @@
+import os
+
+import bs4
+import pytest
+
+import verbnet
+
+
+def frames(parser):
+    return {class_id: [repr(frame) for frame in vc.frames] for class_id, vc in parser.verb_classes_dict.items()}
+
+
+def test_snapshot_round_trip(resources, synthetic_config):
+    cache_path = os.path.join(synthetic_config, "verbnet.snapshot")
+    eager = verbnet.VerbNetParser(directory=resources["vn"])
+    verbnet.VerbNetParser(directory=resources["vn"], cache_path=cache_path)
+    loaded = verbnet.VerbNetParser(directory=resources["vn"], cache_path=cache_path)
+    assert not loaded.parsed_files
+    # Frames and themroles stay deferred in the snapshot until used
+    assert not any("frames" in vars(vc) for vc in loaded.verb_classes_dict.values())
+    assert frames(loaded) == frames(eager)
+    assert {class_id: repr(vc.themroles) for class_id, vc in loaded.verb_classes_dict.items()} == \
+        {class_id: repr(vc.themroles) for class_id, vc in eager.verb_classes_dict.items()}
+    assert loaded.member_index == eager.member_index
+
+
+def test_workers(resources):
+    assert frames(verbnet.VerbNetParser(directory=resources["vn"], workers=2)) == \
+        frames(verbnet.VerbNetParser(directory=resources["vn"]))
+
+
+def test_lazy_matches_eager(resources):
+    eager = verbnet.VerbNetParser(directory=resources["vn"])
+    lazy = verbnet.VerbNetParser(directory=resources["vn"], lazy=True, lazy_cache_size=2)
+    assert lazy.member_index == eager.member_index
+    assert lazy.class_parent == eager.class_parent
+    assert lazy.class_ids == eager.class_ids
+    assert frames(lazy) == frames(eager)
+    assert len(lazy.loaded) <= 2
+
+
+def test_search_frames(resources):
+    eager = verbnet.VerbNetParser(directory=resources["vn"])
+    lazy = verbnet.VerbNetParser(directory=resources["vn"], lazy=True, lazy_cache_size=2)
+    query = {"predicates": ["motion(during(E), Theme)"], "themroles": ["Agent"]}
+    found = [(vc.ID, frame.primary) for vc, frame in eager.search_frames(**query)]
+    assert found
+    assert found == [(vc.ID, frame.primary) for vc, frame in lazy.search_frames(**query)]
+    assert len(lazy.loaded) <= 2
+    assert len(found) == sum(1 for vc in eager.verb_classes_dict.values() for frame in vc.frames
+                             if any(pred.value[0] == "motion" for pred in frame.predicates))
+
+
+def test_search_after_edit(resources):
+    parser = verbnet.VerbNetParser(directory=resources["vn"])
+    matches = parser.search_frames(predicates=["motion"])
+    vc, frame = matches[0]
+    frame.remove_predicates([pred for pred in frame.predicates if pred.value[0] == "motion"])
+    assert parser.frame_index is None
+    assert len(parser.search_frames(predicates=["motion"])) == len(matches) - 1
+
+
+CLASS_FILE = """<?xml version="1.0" encoding="UTF-8"?>
+<!-- <VNCLASS ID="old-1.1"> -->
+<VNCLASS %s>
+  <MEMBERS><MEMBER name="shake" wn="" grouping=""/><!-- <MEMBER name="quake" wn="" grouping=""/> --></MEMBERS>
+  <THEMROLES/><FRAMES/>
+  <SUBCLASSES>
+    <VNSUBCLASS ID="shake-26.5-1">
+      <MEMBERS><MEMBER name="rock" wn="" grouping=""/></MEMBERS>
+      <THEMROLES/><FRAMES/><SUBCLASSES/>
+    </VNSUBCLASS>
+  </SUBCLASSES>
+</VNCLASS>
+"""
+
+
+@pytest.mark.parametrize("attributes", ['ID="shake-26.5"', 'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'])
+def test_scan_class_file(tmp_path, attributes):
+    path = str(tmp_path / "shake-26.5.xml")
+    with open(path, "w") as f:
+        f.write(CLASS_FILE % attributes)
+    vc = verbnet.VerbClass(bs4.BeautifulSoup(CLASS_FILE % attributes, "lxml-xml").VNCLASS)
+    scanned = verbnet.scan_class_file(path)
+    assert scanned[0] == (vc.ID, None, sorted(vc.member_names))
+    assert scanned[1] == ("shake-26.5-1", vc.ID, ["rock"])
+    assert len(scanned) == 2
@@ -1,32 +1,49 @@
 import os
-import json
-
-from nltk.corpus import framenet
+import heapq
+import multiprocessing
+from collections import deque
 
 import verbnet
 import propbank
 import ontonotes
 import annotation
+import annotation_store
+import annotation_index
+import build_report
+import decision_log
+import instance_file
 import vnfn
+import framenet_index
+import mapping_bundle
 import config
 
-import logging
-logging.basicConfig(filename='semlink.log',level=logging.DEBUG)
-
-def normalize_vnc(vnc):
-    return "-".join(vnc.split("-")[1:])
-
 
 class SemLink(object):
-    def __init__(self, filename, vn_path, pb_path, on_path, version):
-        self.annotations = {}
+    def __init__(self, filename, vn_path, pb_path, on_path, version, columnar=False, trace_memory=False,
+                 decisions=None):
+        # Stage timings and update outcome counts, see build_report.py
+        self.report = build_report.BuildReport(trace_memory)
+        # Audit trail of the update decisions, by default the process wide one set up in config
+        self.decisions = decisions if decisions is not None else decision_log.default_log()
+        # A columnar store holds the same annotations in a fraction of the memory, see annotation_store.py
+        self.annotations = annotation_store.AnnotationStore() if columnar else {}
         self.version = version
-
-        for line in open(filename).readlines():
-            ann = annotation.SemLinkAnnotation(line)
-            self.annotations[ann.instance] = ann
+        self.resource_paths = (vn_path, pb_path, on_path)
+        # Built by index() when first queried
+        self.query_index = None
+        # Instance keys in output order as of the last write, and the keys add_annotation() has added since.
+        # New instances have to go through add_annotation() to be written in order
+        self.ordered = []
+        self.added = []
+
+        # Without a filename the instances can still be streamed through the updates, see stream()
+        if filename:
+            with self.report.stage("load_instances"):
+                for ann in annotation.iter_annotations(filename):
+                    self.add_annotation(ann)
 
         self.vno, self.pbo, self.ono, self.fno, self.vn_pb_jsono, self.vn_fno, self.vn_fn_roleso = None, None, None, None, None, None, None
+        self.mappingso = None
 
         # instantiate lexical resources
         self.vn(vn_path)
@@ -36,142 +53,321 @@ class SemLink(object):
 
     def vn(self, directory=config.VN_RESOURCE_PATH, version="3.3"):
         if not self.vno:
-            self.vno = verbnet.VerbNetParser(directory=directory, version=version)
+            with self.report.stage("load_verbnet"):
+                self.vno = verbnet.VerbNetParser(directory=directory, version=version, cache_path=config.VN_CACHE_PATH)
+            vnfn.use_verbnet(self.vno)
         return self.vno
 
-    def fn(self):
+    def fn(self, index_path=None):
         if not self.fno:
-            self.fno = framenet
+            with self.report.stage("load_framenet"):
+                self.fno = framenet_index.FrameNetLemmaIndex(index_path or config.FN_LEMMA_INDEX_PATH)
         return self.fno
 
     def pb(self, directory=config.PB_RESOURCE_PATH, version="unified"):
         if not self.pbo:
-            self.pbo = propbank.PropBankParser(directory=directory, version=version)
+            propbank.use_external_mapping(config.EXTERNAL_VN2PB_PATH, self.external_vn_pb())
+            with self.report.stage("load_propbank"):
+                self.pbo = propbank.PropBankParser(directory=directory, version=version, streaming=True)
         return self.pbo
 
     def on(self, directory=config.ON_RESOURCE_PATH):
         if not self.ono:
-            self.ono = ontonotes.OntoNotesParser(directory=directory)
+            with self.report.stage("load_ontonotes"):
+                self.ono = ontonotes.OntoNotesParser(directory=directory, lazy=True)
         return self.ono
 
-    def external_vn_pb_json(self, filename=config.EXTERNAL_VN2PB_PATH):
+    # Mapping files are read from the bundle of the files set in config, unless another file is given
+    def mappings(self):
+        if not self.mappingso:
+            with self.report.stage("load_mappings"):
+                self.mappingso = mapping_bundle.load_bundle()
+        return self.mappingso
+
+    def external_vn_pb(self, filename=None):
         if not self.vn_pb_jsono:
-            vn_pb_jsono = json.load(open(filename))
-            self.vn_pb_jsono = {normalize_vnc(k): vn_pb_jsono[k] for k in vn_pb_jsono}
+            if filename is None or filename == config.EXTERNAL_VN2PB_PATH:
+                self.vn_pb_jsono = self.mappings().external_vn_pb()
+            else:
+                with self.report.stage("load_mappings"):
+                    self.vn_pb_jsono = propbank.external_vn_pb_mapping(filename)
         return self.vn_pb_jsono
 
-    def vn_fn(self, filename=config.VN2FN_PATH):
+    def external_vn_pb_json(self, filename=None):
+        return self.external_vn_pb(filename).numerical_vn2pb
+
+    def external_pb_vn_json(self, filename=None):
+        return self.external_vn_pb(filename).numerical_pb2vn
+
+    def vn_fn(self, filename=None):
         if not self.vn_fno:
-            self.vn_fno = vnfn.load_mappings(filename)
+            if filename is None or filename == config.VN2FN_PATH:
+                self.vn_fno = self.mappings()["vn_fn"]
+            else:
+                with self.report.stage("load_mappings"):
+                    self.vn_fno = vnfn.load_mappings(filename)
         return self.vn_fno
 
-    def vn_fn_roles(self, filename=config.VN2FN_ROLES_PATH):
+    def vn_fn_roles(self, filename=None):
         if not self.vn_fn_roleso:
-            self.vn_fn_roleso = vnfn.load_element_mappings(mapping_file=filename)
+            if filename is None or filename == config.VN2FN_ROLES_PATH:
+                self.vn_fn_roleso = self.mappings()["vn_fn_roles"]
+            else:
+                with self.report.stage("load_mappings"):
+                    self.vn_fn_roleso = vnfn.load_element_mappings(mapping_file=filename)
         return self.vn_fn_roleso
 
 
     # Run full check and update - VN member/class okay, matches PB, update to VN-PB
     def update_verbnet_from_propbank(self):
         c = 0
-        for ann_key in self.annotations.keys():
-            ann = self.annotations[ann_key]
-            if not ann.check_vn(self.vn(), update=True) and ann.check_pb(self.pb()):
-                roleset = self.pb().rolesets[ann.pb_roleset]
-                if len(roleset.vnc) != 1:
-                    continue
-
-                poss_vn = [annotation.check_vn(vnc, ann.verb, self.vn(), update=True) for vnc in roleset.vnc if annotation.check_vn(vnc, ann.verb, self.vn(), update=True)]
+        with self.report.stage("update_verbnet_from_propbank"):
+            for ann_key in self.annotations.keys():
+                if self.update_ann_verbnet_from_propbank(self.annotations[ann_key]):
+                    c += 1
+        # instances/s shows up in the report
+        self.report.items("update_verbnet_from_propbank", len(self.annotations))
+        return c
+
+    # Single instance step of update_verbnet_from_propbank, returns whether the vn class was updated
+    def update_ann_verbnet_from_propbank(self, ann):
+        if not ann.check_vn(self.vn(), update=True) and ann.check_pb(self.pb()):
+            roleset = self.pb().rolesets[ann.pb_roleset]
+            if len(roleset.vnc) != 1:
+                self.report.count("vn_from_pb.roleset_not_one_class")
+                return False
+
+            poss_vn = [annotation.check_vn(vnc, ann.verb, self.vn(), update=True) for vnc in roleset.vnc if annotation.check_vn(vnc, ann.verb, self.vn(), update=True)]
+
+            if len(poss_vn) == 1:
+                ann.vn_class = poss_vn[0]
+                self.reindex(ann.instance)
+                self.decision("vn_from_pb.found_in_pb", ann, candidates=poss_vn)
+                return True
+            else:
+                self.decision("vn_from_pb.ambiguous_in_pb", ann, candidates=list(poss_vn), pb_vnc=sorted(roleset.vnc))
+
+                for vn_class in self.external_pb_vn_json().get(ann.pb_roleset, []):
+                    checked_result = annotation.check_vn(vn_class, ann.verb, self.vn(), update=True)
+                    if checked_result:
+                        poss_vn.append(checked_result)
 
                 if len(poss_vn) == 1:
-                    c += 1
                     ann.vn_class = poss_vn[0]
-                    logging.info("Found a new vn class in PB : " + str(ann) + " " + str(poss_vn))
+                    self.reindex(ann.instance)
+                    self.decision("vn_from_pb.found_in_vn_pb_json", ann, pb_vnc=sorted(roleset.vnc))
+                    return True
                 else:
-                    logging.info("Match found in PB for missing VN, but didn't have singular option : " + str(ann) + " " + str(roleset))
-
-                    for vn_class in [vnc for vnc in self.external_vn_pb_json().keys() if ann.pb_roleset in self.external_vn_pb_json()[vnc]]:
-                        checked_result = annotation.check_vn(vn_class, ann.verb, self.vn(), update=True)
-                        if checked_result:
-                            poss_vn.append(checked_result)
-
-                    if len(poss_vn) == 1:
-                        c += 1
-                        ann.vn_class = poss_vn[0]
-                        logging.info("Found a new vn class in VN-PB json : " + str(ann) + " " + str(roleset.vnc))
-                    else:
-                        logging.info("Match found in VN-PB json, but not unique : " + str(ann) + " " + str(poss_vn))
+                    self.decision("vn_from_pb.not_unique", ann, candidates=poss_vn)
+        else:
+            self.report.count("vn_from_pb.unchanged")
+        return False
 
     # loading vn annotations from recently redone semlink annotation
     def update_verbnet_from_annotations(self, annotations_dir):
-        for file in os.listdir(annotations_dir):
-            for line in open(annotations_dir + file).readlines():
-                self.add_vn(line)
+        with self.report.stage("update_verbnet_from_annotations"):
+            for file in os.listdir(annotations_dir):
+                with open(annotations_dir + file) as f:
+                    for line in f:
+                        self.add_vn(line)
 
     # check and update framenet mappings based on vn-fn file
     def update_framenet_from_mappings(self):
-        for ann_key in self.annotations.keys():
-            ann = self.annotations[ann_key]
-            if not ann.check_fn(self.fn()) and ann.check_vn(self.vn()):
-                k = ann.vn_class + "-" + ann.verb
-                if k in self.vn_fn():
-                    if len(self.vn_fn()[k]) == 1:
-                        logging.info("Updated fn mapping based on vn-fn : " + str(ann) + " " + str(self.vn_fn()[k]))
-                        ann.fn_frame = self.vn_fn()[k][0]
-                    elif len(self.vn_fn()[k]) == 0:
-                        ann.fn_frame = "NF"
-                        logging.info("Results from vn-fn = NF, no mapping : " + str(ann) + " " + str(self.vn_fn()[k]))
-                    else:
-                        ann.fn_frame = "IN"
-                        logging.info("Results from vn-fn = IN, multiple mappings : " + str(ann) + " " + str(self.vn_fn()[k]))
+        with self.report.stage("update_framenet_from_mappings"):
+            for ann_key in self.annotations.keys():
+                self.update_ann_framenet_from_mappings(self.annotations[ann_key])
+
+    def update_ann_framenet_from_mappings(self, ann):
+        if not ann.check_fn(self.fn()) and ann.check_vn(self.vn()):
+            k = ann.vn_class + "-" + ann.verb
+            if k in self.vn_fn():
+                frames = self.vn_fn()[k]
+                if len(frames) == 1:
+                    old_frame = ann.fn_frame
+                    ann.fn_frame = frames[0]
+                    self.reindex(ann.instance)
+                    self.decision("fn_from_mappings.updated", ann, old=old_frame)
+                elif len(frames) == 0:
+                    ann.fn_frame = "NF"
+                    self.reindex(ann.instance)
+                    self.decision("fn_from_mappings.NF", ann)
+                else:
+                    ann.fn_frame = "IN"
+                    self.reindex(ann.instance)
+                    self.decision("fn_from_mappings.IN", ann, frames=frames)
+            else:
+                self.report.count("fn_from_mappings.no_mapping")
+        else:
+            self.report.count("fn_from_mappings.unchanged")
 
     # Adds and updates instances based on a PB release, preferable the new unified WSJ
     def update_propbank_from_release(self, pb_release_location):
-        for folder in os.listdir(pb_release_location):
-            for f in os.listdir(pb_release_location + folder):
-                if f.endswith(".prop"):
-                    for line in open(pb_release_location + folder + "/" + f).readlines():
-                        self.add_pb(line)
+        with self.report.stage("update_propbank_from_release"):
+            for folder in os.listdir(pb_release_location):
+                for f in os.listdir(pb_release_location + folder):
+                    if f.endswith(".prop"):
+                        with open(pb_release_location + folder + "/" + f) as lines:
+                            for line in lines:
+                                self.add_pb(line)
 
     # Updates ON sense annotations from a release, likely the ON-4.99
     def update_ontonotes_from_release(self, on_release_location):
-        for folder in os.listdir(on_release_location):
-            for f in os.listdir(on_release_location + folder):
-                if f.endswith("sense"):
-                    for line in open(on_release_location + folder + "/" + f):
-                        self.add_on(line)
+        with self.report.stage("update_ontonotes_from_release"):
+            for folder in os.listdir(on_release_location):
+                for f in os.listdir(on_release_location + folder):
+                    if f.endswith("sense"):
+                        with open(on_release_location + folder + "/" + f) as lines:
+                            for line in lines:
+                                self.add_on(line)
+            self.check_ontonotes()
+
+    # Cross-check the ON groups of the instances against their PB rolesets and VN classes
+    def check_ontonotes(self):
+        annotations = [self.annotations[instance] for instance in self.annotations]
+        problems = self.on().check_groupings(annotations)
+        for ann, problem in problems:
+            self.decision("on_check." + problem, ann, on_group=ann.on_group)
+        self.report.count("on_check.checked", sum(1 for ann in annotations if ann.on_group))
 
 
     # Update dependency tags in instances. Great for PB-VN, but VN-FN role mappings seem to be still out of date
     def update_dependencies(self):
-        for ann_key in self.annotations:
-            ann = self.annotations[ann_key]
-            new_deps = []
-            final_deps = []
-            if not ann.dependencies:
-                continue
-            for dep in ann.dependencies:
-                dep = dep.split("=")[0]
-                if ann.pb_roleset in self.pb().rolesets:
-                    for role_mapping_key in self.pb().rolesets[ann.pb_roleset].role_mappings:
-                        if role_mapping_key in dep:
-                            role_mapping = self.pb().rolesets[ann.pb_roleset].role_mappings[role_mapping_key]
-                            role_mapping = {annotation.check_vn(vnc, ann.verb, self.vn(), update=True):role_mapping[vnc] for vnc in role_mapping}
-                            if False in role_mapping:
-                                del role_mapping[False]
-
-                            if ann.vn_class in role_mapping:
-                                dep += ";" + role_mapping[ann.vn_class].capitalize()
-                new_deps.append(dep)
-
-            for dep in new_deps:
-                if ann.vn_class and ann.fn_frame and ann.vn_class + ";" + ann.fn_frame in self.vn_fn_roles():
-                    role_mapping = self.vn_fn_roles()[ann.vn_class + ";" + ann.fn_frame]
-                    if dep.split(";")[-1] in role_mapping:
-                        dep += ";" + role_mapping[dep.split(";")[-1]]
-                final_deps.append(dep)
+        with self.report.stage("update_dependencies"):
+            for ann_key in self.annotations:
+                self.update_ann_dependencies(self.annotations[ann_key])
         return
 
+    def update_ann_dependencies(self, ann):
+        new_deps = []
+        final_deps = []
+        if not ann.dependencies:
+            self.report.count("dependencies.none")
+            return
+        self.report.count("dependencies.checked")
+        for dep in ann.dependencies:
+            dep = dep.split("=")[0]
+            if ann.pb_roleset in self.pb().rolesets:
+                for role_mapping_key in self.pb().rolesets[ann.pb_roleset].role_mappings:
+                    if role_mapping_key in dep:
+                        role_mapping = self.pb().rolesets[ann.pb_roleset].role_mappings[role_mapping_key]
+                        role_mapping = {annotation.check_vn(vnc, ann.verb, self.vn(), update=True):role_mapping[vnc] for vnc in role_mapping}
+                        if False in role_mapping:
+                            del role_mapping[False]
+
+                        if ann.vn_class in role_mapping:
+                            dep += ";" + role_mapping[ann.vn_class].capitalize()
+            new_deps.append(dep)
+
+        for dep in new_deps:
+            if ann.vn_class and ann.fn_frame and ann.vn_class + ";" + ann.fn_frame in self.vn_fn_roles():
+                role_mapping = self.vn_fn_roles()[ann.vn_class + ";" + ann.fn_frame]
+                if dep.split(";")[-1] in role_mapping:
+                    dep += ";" + role_mapping[dep.split(";")[-1]]
+            final_deps.append(dep)
+
+    def update_stream(self, annotations):
+        """Run the vn, fn and dependency updates on each annotation of an iterable in turn, yielding it when done.
+        Instances are independent, so each annotation is updated as it would be by the passes over
+        self.annotations. Unlike those, every annotation of the iterable is yielded, repeated instance keys
+        included, in the order they come"""
+        for ann in annotations:
+            self.update_ann_verbnet_from_propbank(ann)
+            self.update_ann_framenet_from_mappings(ann)
+            self.update_ann_dependencies(ann)
+            yield ann
+
+    def update_parallel(self, workers):
+        """Run the vn, fn and dependency updates in a pool of worker processes, one shard per source file.
+        Every worker loads the lexical resources once; the updated annotations are written back into
+        self.annotations, with the same result as running the passes here.
+
+        Only the instance keys are grouped up front. A shard is copied out of self.annotations when it is sent, and
+        at most two shards per worker are in flight, so a columnar store isn't duplicated as objects"""
+        instances_by_file = {}
+        for instance in self.annotations:
+            instances_by_file.setdefault(instance.partition(" ")[0], []).append(instance)
+
+        with self.report.stage("update_parallel"), \
+                multiprocessing.Pool(workers, initializer=init_shard_worker,
+                                     initargs=(self.resource_paths, self.version)) as pool:
+            pending = deque()
+            for instances in instances_by_file.values():
+                pending.append(pool.apply_async(update_shard, (self.detached(instances),)))
+                if len(pending) >= 2 * workers:
+                    self.merge_shard(*pending.popleft().get())
+            while pending:
+                self.merge_shard(*pending.popleft().get())
+
+    def detached(self, instances):
+        """Plain copies of the annotations of instances, so views into a columnar store can be sent to the workers"""
+        copies = []
+        for instance in instances:
+            copy = annotation.SemLinkAnnotation()
+            copy.from_ann(self.annotations[instance])
+            copies.append(copy)
+        return copies
+
+    def merge_shard(self, updated, counters, decisions):
+        self.report.merge_counters(counters)
+        self.decisions.extend(decisions)
+        for ann in updated:
+            self.annotations[ann.instance] = ann
+            self.reindex(ann.instance)
+
+    def stream(self, input_file, output_file, deduplicate=False):
+        """Update the instances of input_file and write them to output_file one at a time, without loading the
+        file into self.annotations. The output keeps the order of the input, it isn't sorted like write()'s, and
+        every line is written, so memory stays constant whatever the size of input_file.
+
+        With deduplicate=True an instance key found on several lines is written once, updated from its last
+        line, as when loading the file replaces earlier lines with later ones. That takes a first pass over
+        input_file keeping the last line number of every key: memory grows with the number of distinct keys,
+        about 150 bytes each (key string and dict entry), though still without the annotations"""
+        with self.report.stage("stream"), open(output_file, "w") as o:
+            annotations = annotation.iter_annotations(input_file)
+            if deduplicate:
+                annotations = self.last_of_each_instance(annotations, last_lines(input_file))
+            for ann in self.update_stream(annotations):
+                o.write(ann.writable() + "\n")
+
+    def last_of_each_instance(self, annotations, last):
+        for n, ann in enumerate(annotations):
+            if last[ann.instance] == n:
+                yield ann
+            else:
+                self.report.count("stream.duplicate")
+
+    def decision(self, category, ann, **details):
+        """Count a decision of the updates in the report and add it to the decision log"""
+        self.report.count(category)
+        self.decisions.log(category, ann, **details)
+
+    def index(self):
+        """Secondary indexes over the annotations, built on first use and kept up to date from then on"""
+        if self.query_index is None:
+            self.query_index = annotation_index.AnnotationIndex(self.annotations)
+        return self.query_index
+
+    def reindex(self, instance):
+        if self.query_index is not None and instance in self.annotations:
+            self.query_index.add(instance, self.annotations[instance])
+
+    def query(self, **criteria):
+        """Annotations whose fields equal all the given values, in instance order. Any of verb, vn_class, fn_frame,
+        pb_roleset, on_group and source_file can be used, e.g. query(fn_frame="Body_movement", on_group="1")"""
+        return sorted((self.annotations[instance] for instance in self.index().query(**criteria)),
+                      key=lambda ann: (ann.sort_key(), ann.instance))
+
+    def count(self, **criteria):
+        return len(self.index().query(**criteria))
+
+    def add_annotation(self, ann):
+        """Add a new instance, keeping track of it for the next ordered write"""
+        if ann.instance not in self.annotations:
+            self.added.append(ann.instance)
+        self.annotations[ann.instance] = ann
+        self.reindex(ann.instance)
+
     # Add or update a SemLink instance based on a VerbNet annotation
     def add_vn(self, instance):
         vn_ann = annotation.VnAnnotation(instance)
@@ -179,18 +375,24 @@ class SemLink(object):
             if vn_ann.instance not in self.annotations:
                 new_ann = annotation.SemLinkAnnotation()
                 new_ann.from_vn_ann(vn_ann)
-                self.annotations[new_ann.instance] = new_ann
+                self.add_annotation(new_ann)
+                self.report.count("vn_annotations.added")
             elif not self.annotations[vn_ann.instance].vn_class:
-                logging.info("Missing vn annotation, adding : " + str(vn_ann.instance) + " " + vn_ann.vn_class)
                 self.annotations[vn_ann.instance].vn_class = vn_ann.vn_class
+                self.reindex(vn_ann.instance)
+                self.decision("vn_annotations.filled_missing", self.annotations[vn_ann.instance])
             elif self.annotations[vn_ann.instance].vn_class != vn_ann.vn_class:
-                logging.info("Instance already has vn class and they don't match, updating to new annotation : " + str(self.annotations[vn_ann.instance].vn_class) + " != " + str(vn_ann.vn_class))
+                old_class = self.annotations[vn_ann.instance].vn_class
                 self.annotations[vn_ann.instance].vn_class = vn_ann.vn_class
+                self.reindex(vn_ann.instance)
+                self.decision("vn_annotations.replaced", self.annotations[vn_ann.instance], old=old_class)
+            else:
+                self.report.count("vn_annotations.unchanged")
         elif vn_ann.vn_class:       # has a class but isn't a good class
-            logging.info("New vn class is bad : '" + str(vn_ann.vn_class) + "' " + str(vn_ann.verb))
+            self.decision("vn_annotations.bad_class", vn_ann)
         else:
-            pass
             # No annotation, don't add it. Not logging
+            self.report.count("vn_annotations.no_class")
 
 
     # Add or update a SemLink instance based on PropBank annotation
@@ -199,13 +401,19 @@ class SemLink(object):
         if a.instance not in self.annotations:
             new_ann = annotation.SemLinkAnnotation()
             new_ann.from_pb_ann(a)
-            self.annotations[new_ann.instance] = new_ann
+            self.add_annotation(new_ann)
+            self.report.count("pb_release.added")
         elif not self.annotations[a.instance].pb_roleset:
-            logging.info("Missing pb roleset, adding : " + str(a.instance) + " " + a.pb_roleset)
             self.annotations[a.instance].pb_roleset = a.pb_roleset
+            self.reindex(a.instance)
+            self.decision("pb_release.filled_missing", self.annotations[a.instance])
         elif self.annotations[a.instance].pb_roleset != a.pb_roleset:
-            logging.info("Pb roleset mismatch, rewriting with new pb annotation : " + str(self.annotations[a.instance].pb_roleset) + " replaced with " + str(a.pb_roleset))
+            old_roleset = self.annotations[a.instance].pb_roleset
             self.annotations[a.instance].pb_roleset = a.pb_roleset
+            self.reindex(a.instance)
+            self.decision("pb_release.replaced", self.annotations[a.instance], old=old_roleset)
+        else:
+            self.report.count("pb_release.unchanged")
         return
 
 
@@ -213,44 +421,79 @@ class SemLink(object):
     def add_on(self, instance):
         a = annotation.OnAnnotation(instance)
         if "-n" in a.verb:
+            self.report.count("on_release.noun")
             return
 
         if a.instance not in self.annotations:
             # shouldn't have to add new annotations from on, as they should be in pb. but maybe?
-            logging.info("Not in anns??? : " + str(a.instance) + " : " + a.verb + " " + a.on_group)
+            self.decision("on_release.not_in_annotations", a)
         elif not self.annotations[a.instance].on_group:
-            logging.info("Missing on annotation, adding : " + str(a.instance) + " " + a.on_group)
             self.annotations[a.instance].on_group = a.on_group
+            self.reindex(a.instance)
+            self.decision("on_release.filled_missing", self.annotations[a.instance])
         elif self.annotations[a.instance].on_group != a.on_group:
-            logging.info("On grouping mismatch, rewriting with new on annotation : " + str(self.annotations[a.instance].on_group) + " replaced with " + str(a.on_group))
+            old_group = self.annotations[a.instance].on_group
             self.annotations[a.instance].on_group = a.on_group
+            self.reindex(a.instance)
+            self.decision("on_release.replaced", self.annotations[a.instance], old=old_group)
+        else:
+            self.report.count("on_release.unchanged")
+
 
+    def sorted_instances(self):
+        """Instance keys in numeric document, sentence, token order. The order from the previous call is kept:
+        instances added since are sorted on their own and merged into it, and deleted ones dropped from it"""
+        def key(instance):
+            return self.annotations[instance].sort_key(), instance
+
+        ordered = [instance for instance in self.ordered if instance in self.annotations]
+        self.ordered = list(heapq.merge(ordered, sorted(self.added, key=key), key=key))
+        self.added = []
+        return self.ordered
 
     def write(self, output_file="semlink2.0"):
-        with open(output_file, "w") as o:
-            for a in sorted(self.annotations):
+        with self.report.stage("write"), open(output_file, "w") as o:
+            for a in self.sorted_instances():
                 o.write(self.annotations[a].writable() + "\n")
 
+    def write_binary(self, output_file="semlink2.0.bin"):
+        # Random access version of write(), see instance_file.py
+        with self.report.stage("write_binary"):
+            instance_file.write_instances((self.annotations[a] for a in self.annotations), output_file)
+
 
 def counts(semlink):
-    total, pb, vn, fn, on = 0, 0, 0, 0, 0
-    for key in semlink.annotations:
-        instance = semlink.annotations[key]
-        total += 1
-        if instance.pb_roleset:
-            pb += 1
-        if instance.vn_class:
-            vn += 1
-        if instance.fn_frame and instance.fn_frame != "NF" and instance.fn_frame != "IN":
-            fn += 1
-        if instance.on_group:
-            on += 1
+    index = semlink.index()
+    total = len(index)
+    pb = index.count("pb_roleset")
+    vn = index.count("vn_class")
+    fn = index.count("fn_frame", lambda frame: frame and frame != "NF" and frame != "IN")
+    on = index.count("on_group")
     print (total, pb, vn, fn, on)
 
 
-def build_semlink():
+# SemLink used by update_shard in pool worker processes, see SemLink.update_parallel
+shard_semlink = None
+
+
+def init_shard_worker(resource_paths, version):
+    global shard_semlink
+    vn_path, pb_path, on_path = resource_paths
+    # decisions are sent back with each shard and logged by the parent
+    shard_semlink = SemLink(None, vn_path=vn_path, pb_path=pb_path, on_path=on_path, version=version,
+                            decisions=decision_log.from_config())
+
+
+def update_shard(annotations):
+    """Updated annotations of a shard, and the outcome counts and decisions of its updates"""
+    shard_semlink.report.counters.clear()
+    updated = list(shard_semlink.update_stream(annotations))
+    return updated, dict(shard_semlink.report.counters), shard_semlink.decisions.take()
+
+
+def build_semlink(workers=None, trace_memory=False, report_file="test_semlink.report.json"):
     print ("building old semlink...")
-    semlink = SemLink(config.OLD_VERSION_PATH, vn_path=config.VN_RESOURCE_PATH, pb_path=config.PB_RESOURCE_PATH, on_path=config.ON_RESOURCE_PATH, version="2.0")
+    semlink = SemLink(config.OLD_VERSION_PATH, vn_path=config.VN_RESOURCE_PATH, pb_path=config.PB_RESOURCE_PATH, on_path=config.ON_RESOURCE_PATH, version="2.0", columnar=True, trace_memory=trace_memory)
 
     # The following steps add instances based on other annotation projects
     # VN and ON projects cannot be released due to licensing; PB release is available via their GitHub
@@ -263,15 +506,47 @@ def build_semlink():
     semlink.update_ontonotes_from_release(config.ON_RELEASE_PATH)
     '''
 
-    print ("updating vn from pb...")
-    semlink.update_verbnet_from_propbank()
-    print ("updating from vn-fn mappings...")
-    semlink.update_framenet_from_mappings()
-    print ("updating dependency information from pb-vn-fn...")
-    semlink.update_dependencies()
+    if workers and workers > 1:
+        print ("updating vn, fn and dependencies in %d processes..." % workers)
+        semlink.update_parallel(workers)
+    else:
+        print ("updating vn from pb...")
+        semlink.update_verbnet_from_propbank()
+        print ("updating from vn-fn mappings...")
+        semlink.update_framenet_from_mappings()
+        print ("updating dependency information from pb-vn-fn...")
+        semlink.update_dependencies()
 
     semlink.write(output_file="test_semlink")
 
+    # Where the time went and what the updates did
+    print (semlink.report)
+    if report_file:
+        semlink.report.write(report_file)
+    semlink.decisions.close()
+
+
+
+def last_lines(input_file):
+    """Instance key -> number of the last line with that key, counting non-empty lines from 0 like
+    annotation.iter_annotations"""
+    last = {}
+    with open(input_file) as f:
+        n = 0
+        for line in f:
+            if line.strip():
+                last[annotation.parse_instance(line.split())[3]] = n
+                n += 1
+    return last
+
+
+def stream_semlink(input_file=config.OLD_VERSION_PATH, output_file="test_semlink", deduplicate=False):
+    # Same updates as build_semlink, but instances are read, updated and written one at a time, in input order
+    # rather than sorted. Nothing is held per instance unless deduplicate is set, which keeps one line per
+    # instance key like build_semlink at the cost of holding every key, see SemLink.stream
+    semlink = SemLink(None, vn_path=config.VN_RESOURCE_PATH, pb_path=config.PB_RESOURCE_PATH, on_path=config.ON_RESOURCE_PATH, version="2.0")
+    semlink.stream(input_file, output_file, deduplicate)
+
 
 if __name__ == "__main__":
     build_semlink()
\ No newline at end of file
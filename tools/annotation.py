@@ -1,35 +1,96 @@
+import re
+from functools import lru_cache
+
+import framenet_index
+
+
 def check_vn(vn_class, verb, vn, update=False):
     if not vn_class:
         return False
-    if vn_class in vn.verb_classes_numerical_dict:
-        if verb in [m.name for m in vn.verb_classes_numerical_dict[vn_class].members]:
+    if vn_class in vn.class_ids:
+        if vn.has_member(vn_class, verb):
             return vn_class
     if update:
-        if vn_class not in vn.verb_classes_numerical_dict:
-            if vn_class.split("-")[0] in vn.verb_classes_numerical_dict:
+        if vn_class not in vn.class_ids:
+            if vn_class.split("-")[0] in vn.class_ids:
                 vn_class = vn_class.split("-")[0]
             else:
                 return False
 
-        for subclass in [vn.verb_classes_numerical_dict[vn_class.split("-")[0]]] + vn.verb_classes_numerical_dict[vn_class.split("-")[0]].get_all_subclasses():
-            if verb in [m.name for m in subclass.get_members()]:
-                return subclass.numerical_ID
+        return vn.find_member_subclass(vn_class.split("-")[0], verb)
     return False
 
+# Sentence and token numbers get this many bits each in an instance sort key, the document number the rest of 64
+NUMBER_BITS = 21
+DOCUMENT_BITS = 64 - 2 * NUMBER_BITS
+DOCUMENT_NUMBER = re.compile(r"^(.*?)(\d+)$")
+
+
+@lru_cache(maxsize=None)
+def document_key(source_file):
+    """Split a document name into the part before its trailing number and the number, without the extension.
+    Names without a trailing number (or one too large for a sort key) are ordered by the whole name
+
+    >>> document_key("nw/wsj/00/wsj_0001.mrg"), document_key("cctv_0001.mrg"), document_key("readme.txt")
+    (('wsj_', 1), ('cctv_', 1), ('readme', 0))
+    """
+    name = source_file.rpartition("/")[2]
+    stem = name.rpartition(".")[0] or name
+    match = DOCUMENT_NUMBER.match(stem)
+    if match and int(match.group(2)) < 1 << DOCUMENT_BITS:
+        return match.group(1), int(match.group(2))
+    return stem, 0
+
+
+def instance_sort_key(source_file, sentence_no, token_no):
+    """Numeric (document, sentence, token) order key: the document name prefix, and the document number, sentence
+    and token packed into one integer. Documents sort by prefix ("cctv_" before "wsj_"), then numerically
+
+    >>> sorted(["wsj_0010.mrg 0 1", "wsj_0002.mrg 1 0", "cctv_0001.mrg 0 5", "wsj_0002.mrg 0 12"],
+    ...        key=lambda instance: instance_sort_key(*instance.split()))
+    ['cctv_0001.mrg 0 5', 'wsj_0002.mrg 0 12', 'wsj_0002.mrg 1 0', 'wsj_0010.mrg 0 1']
+    """
+    prefix, number = document_key(source_file)
+    sentence_no, token_no = int(sentence_no), int(token_no)
+    if not 0 <= sentence_no < 1 << NUMBER_BITS or not 0 <= token_no < 1 << NUMBER_BITS:
+        raise ValueError("sentence and token numbers must be between 0 and %d" % (1 << NUMBER_BITS))
+    return prefix, (((number << NUMBER_BITS) | sentence_no) << NUMBER_BITS) | token_no
+
+
+def parse_instance(attr_list):
+    """Source file, sentence and token number and instance key from the first three fields of a line"""
+    source_file = attr_list[0].rpartition("/")[2]
+    return source_file, attr_list[1], attr_list[2], source_file + " " + attr_list[1] + " " + attr_list[2]
+
+
+def parse_verb(token):
+    return token[:-2] if token.endswith("-v") else token
+
+
+def iter_annotations(filename):
+    """Lazily parse a SemLink instance file, one SemLinkAnnotation per non-empty line"""
+    with open(filename) as f:
+        for line in f:
+            if line.strip():
+                yield SemLinkAnnotation(line)
+
+
 class Annotation(object):
+    # Fixed slots instead of a __dict__; release ingestion creates millions of these
+    __slots__ = ("dep", "source_file", "sentence_no", "token_no", "verb", "vn_class", "fn_frame", "pb_roleset",
+                 "on_group", "dependencies", "instance", "source", "_sort_key")
+
     def __init__(self):
-        self.dep = None
-        self.source_file = None
-        self.sentence_no = None
-        self.token_no = None
-        self.verb = None
-        self.vn_class = None
-        self.fn_frame = None
-        self.pb_roleset = None
-        self.on_group = None
-        self.dependencies = None
-        self.instance = None
-        self.source = None
+        # keep in sync with ANNOTATION_FIELDS
+        self.dep = self.source_file = self.sentence_no = self.token_no = self.verb = self.vn_class = \
+            self.fn_frame = self.pb_roleset = self.on_group = self.dependencies = self.instance = self.source = \
+            self._sort_key = None
+
+    def sort_key(self):
+        """Numeric (document, sentence, token) order key, computed on first use"""
+        if self._sort_key is None:
+            self._sort_key = instance_sort_key(self.source_file, self.sentence_no, self.token_no)
+        return self._sort_key
 
     def __hash__(self):
         return hash(self.__str__())
@@ -44,13 +105,7 @@ class Annotation(object):
         return str([self.instance, self.verb, self.vn_class, self.pb_roleset, self.on_group, self.fn_frame, self.source])
 
     def __lt__(self, other):
-        if int(self.source_file.split("/")[-1][4:8]) != int(other.source_file.split("/")[-1][4:8]):
-            return int(self.source_file.split("/")[-1][4:8]) < int(other.source_file.split("/")[-1][4:8])
-        if int(self.sentence_no) != int(other.sentence_no):
-            return int(self.sentence_no) < int(other.sentence_no)
-        if int(self.token_no) != int(other.token_no):
-            return int(self.token_no) < int(other.token_no)
-        return 0
+        return self.sort_key() < other.sort_key()
 
     def __gt__(self, other):
         if not self.__lt__(other):
@@ -67,13 +122,15 @@ class Annotation(object):
         return False
 
     def check_on(self, on):
-        if self.on_group and self.verb + "-v-" + self.on_group in on.groupings.keys():
+        if self.on_group and on.has_grouping(self.verb + "-v", self.on_group):
             return True
         return False
 
     def check_fn(self, fn):
         if not self.fn_frame or self.fn_frame in ["IN", "NF"]:
             return False
+        if isinstance(fn, framenet_index.FrameNetLemmaIndex):
+            return self.fn_frame in fn.frame_names_by_lemma(self.verb)
         poss_frames = fn.frames_by_lemma(self.verb)
         if self.fn_frame and self.fn_frame in [f.name for f in poss_frames]:
             return True
@@ -82,20 +139,22 @@ class Annotation(object):
     def writable(self):
         return str(self)
 
+ANNOTATION_FIELDS = tuple(f for f in Annotation.__slots__ if not f.startswith("_"))
+
+
 class VnAnnotation(Annotation):
+    __slots__ = ()
+
     def __init__(self, line):
         super().__init__()
         attr_list = line.split()
-        self.source_file = attr_list[0].split("/")[-1]
-        self.sentence_no = attr_list[1]
-        self.token_no = attr_list[2]
-        self.verb = attr_list[3][:-2] if attr_list[3].endswith("-v") else attr_list[3]
+        self.source_file, self.sentence_no, self.token_no, self.instance = parse_instance(attr_list)
+        self.verb = parse_verb(attr_list[3])
 
-        self.vn_class = attr_list[4] if attr_list[4] != "None" else None
-        if self.vn_class and self.vn_class[0] not in [0-9]:
-            self.vn_class = "-".join(self.vn_class.split("-")[1:])
-
-        self.instance = self.source_file + " " + self.sentence_no + " " + self.token_no
+        vn_class = attr_list[4] if attr_list[4] != "None" else None
+        if vn_class and vn_class[0] not in [0-9]:
+            vn_class = "-".join(vn_class.split("-")[1:])
+        self.vn_class = vn_class
         self.source = "vn"
 
     def exists_in(self, vn):
@@ -105,39 +164,38 @@ class VnAnnotation(Annotation):
         return self.instance + " " + self.verb + " " + str(self.vn_class)
 
 class PbAnnotation(Annotation):
+    __slots__ = ()
+
     def __init__(self, line):
         super().__init__()
 
         attr_list = line.split()
-        self.source_file = attr_list[0].split("/")[-1]
-        self.sentence_no = attr_list[1]
-        self.token_no = attr_list[2]
-        self.verb = attr_list[4][:-2] if attr_list[4].endswith("-v") else attr_list[4]
+        self.source_file, self.sentence_no, self.token_no, self.instance = parse_instance(attr_list)
+        self.verb = parse_verb(attr_list[4])
 
         self.pb_roleset = attr_list[5]
         self.dependencies = attr_list[6:]
-
-        self.instance = self.source_file + " " + self.sentence_no + " " + self.token_no
         self.source = "pb"
 
 class OnAnnotation(Annotation):
+    __slots__ = ()
+
     def __init__(self, line):
         super().__init__()
 
         attr_list = line.split()
-        self.source_file = attr_list[0].split("/")[-1]
-        self.sentence_no = attr_list[1]
-        self.token_no = attr_list[2]
-        self.verb = attr_list[3][:-2] if attr_list[3].endswith("-v") else attr_list[3]
+        self.source_file, self.sentence_no, self.token_no, self.instance = parse_instance(attr_list)
+        self.verb = parse_verb(attr_list[3])
 
         self.on_group = attr_list[4]
-
-        self.instance = self.source_file + " " + self.sentence_no + " " + self.token_no
         self.source = "on"
 
 class SemLinkAnnotation(Annotation):
+    __slots__ = ("input_line",)
+
     def __init__(self, line=None):
         super().__init__()
+        self.input_line = None
 
         if line:
             self.from_semlink_line(line)
@@ -146,15 +204,12 @@ class SemLinkAnnotation(Annotation):
         self.input_line = line.strip()
         attr_list = line.split()
 
-        self.source_file = attr_list[0].split("/")[-1]
-        self.sentence_no = attr_list[1]
-        self.token_no = attr_list[2]
-        self.instance = self.source_file + " " + self.sentence_no + " " + self.token_no
+        self.source_file, self.sentence_no, self.token_no, self.instance = parse_instance(attr_list)
 
         if "-v" in attr_list[3] or attr_list[3] != "gold":
             attr_list.insert(3, "gold")
 
-        self.verb = attr_list[4][:-2] if attr_list[4].endswith("-v") else attr_list[4]
+        self.verb = parse_verb(attr_list[4])
         self.vn_class = attr_list[5]
         self.fn_frame = attr_list[6]
         self.pb_roleset = attr_list[7]
@@ -164,6 +219,13 @@ class SemLinkAnnotation(Annotation):
         if len(attr_list) > 8:
             self.dependencies = attr_list[9:]
 
+    def from_ann(self, ann):
+        """Copy every field of another annotation, e.g. to detach a StoredAnnotation from its store"""
+        for field in ANNOTATION_FIELDS:
+            setattr(self, field, getattr(ann, field))
+        self.dependencies = list(ann.dependencies) if ann.dependencies is not None else None
+        self.input_line = ann.input_line
+
     # rewrite these two as generic a generic 'populate from other object' \/
     def from_vn_ann(self, vn_ann):
         self.dep = vn_ann.dep
@@ -0,0 +1,72 @@
+"""annotation_index.py
+
+Secondary indexes over SemLink annotations: for each indexed field, value -> set of instance keys. Conjunctive
+queries ("VN class 26.5 and ON group 1") are answered by intersecting the sets, starting from the smallest.
+"""
+
+INDEXED_FIELDS = ("verb", "vn_class", "fn_frame", "pb_roleset", "on_group", "source_file")
+EMPTY = frozenset()
+
+
+class AnnotationIndex(object):
+
+    def __init__(self, annotations=None):
+        self.postings = {field: {} for field in INDEXED_FIELDS}
+        # instance -> its indexed values when it was last indexed, to find the entries to drop when it changes
+        self.values = {}
+
+        if annotations is not None:
+            for instance in annotations:
+                self.add(instance, annotations[instance])
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, instance, ann):
+        """Index an annotation, or reindex it if it was indexed before"""
+        new = tuple(getattr(ann, field) for field in INDEXED_FIELDS)
+        old = self.values.get(instance)
+        if old == new:
+            return
+        for field, old_value, new_value in zip(INDEXED_FIELDS, old or [None] * len(INDEXED_FIELDS), new):
+            if old is not None and old_value == new_value:
+                continue
+            if old is not None:
+                self.discard(field, old_value, instance)
+            self.postings[field].setdefault(new_value, set()).add(instance)
+        self.values[instance] = new
+
+    def remove(self, instance):
+        old = self.values.pop(instance, None)
+        if old is not None:
+            for field, value in zip(INDEXED_FIELDS, old):
+                self.discard(field, value, instance)
+
+    def discard(self, field, value, instance):
+        instances = self.postings[field].get(value)
+        if instances is not None:
+            instances.discard(instance)
+            if not instances:
+                del self.postings[field][value]
+
+    def lookup(self, field, value):
+        if field not in self.postings:
+            raise ValueError("%s is not indexed, use one of %s" % (field, ", ".join(INDEXED_FIELDS)))
+        return self.postings[field].get(value, EMPTY)
+
+    def query(self, **criteria):
+        """Set of instance keys whose fields equal all of the given values, e.g. query(vn_class="26.5", on_group="1").
+        With no criteria, every instance matches"""
+        if not criteria:
+            return set(self.values)
+        matches = sorted((self.lookup(field, value) for field, value in criteria.items()), key=len)
+        res = set(matches[0])
+        for instances in matches[1:]:
+            if not res:
+                break
+            res.intersection_update(instances)
+        return res
+
+    def count(self, field, predicate=bool):
+        """Number of instances whose value for field satisfies predicate (by default: is truthy)"""
+        return sum(len(instances) for value, instances in self.postings[field].items() if predicate(value))
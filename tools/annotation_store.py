@@ -0,0 +1,208 @@
+"""annotation_store.py
+
+Columnar storage for SemLink annotations. Instead of one SemLinkAnnotation object per instance, every field is kept
+in a column: strings are interned in a table per field and stored as small integer ids, sentence and token numbers
+as integer arrays, and dependencies as runs in a shared pool of interned dependency strings.
+
+An AnnotationStore can stand in for the SemLink.annotations dict: it is keyed by the instance string
+("wsj_0001.mrg 0 8"), and indexing it returns a view with the usual SemLinkAnnotation attributes.
+"""
+
+from array import array
+from collections.abc import MutableMapping
+
+import annotation
+
+# Sentence and token numbers are packed into the row key with this many bits each
+NUMBER_BITS = annotation.NUMBER_BITS
+
+
+class StringTable(object):
+    """Interns strings as integers. Id 0 is reserved for None"""
+
+    def __init__(self):
+        self.strings = [None]
+        self.ids = {None: 0}
+
+    def __len__(self):
+        return len(self.strings)
+
+    def id(self, s):
+        """Return the id of s, adding it to the table if it's new"""
+        i = self.ids.get(s)
+        if i is None:
+            i = self.ids[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+
+class AnnotationStore(MutableMapping):
+    """Mapping of instance key -> annotation, stored column-wise. Sentence and token numbers are kept as
+    integers, so they are read back in their canonical form ("08" becomes "8")"""
+
+    STRING_FIELDS = ("source_file", "verb", "vn_class", "fn_frame", "pb_roleset", "on_group", "source")
+
+    def __init__(self, annotations=None):
+        self.tables = {field: StringTable() for field in self.STRING_FIELDS}
+        self.columns = {field: array("I") for field in self.STRING_FIELDS}
+        self.sentence_nos = array("i")
+        self.token_nos = array("i")
+
+        # dependencies of a row are dep_pool[dep_starts[row]:dep_starts[row] + dep_lengths[row]],
+        # a length of -1 meaning None
+        self.deps = StringTable()
+        self.dep_pool = array("I")
+        self.dep_starts = array("I")
+        self.dep_lengths = array("i")
+
+        # packed (source file id, sentence, token) -> row
+        self.rows = {}
+
+        if annotations:
+            for ann in annotations:
+                self[ann.instance] = ann
+
+    def row_key(self, source_file_id, sentence_no, token_no):
+        sentence_no, token_no = int(sentence_no), int(token_no)
+        if not 0 <= sentence_no < 1 << NUMBER_BITS or not 0 <= token_no < 1 << NUMBER_BITS:
+            raise ValueError("sentence and token numbers must be between 0 and %d" % (1 << NUMBER_BITS))
+        return (((source_file_id << NUMBER_BITS) | sentence_no) << NUMBER_BITS) | token_no
+
+    def find_row(self, instance):
+        """Row of an instance key, or None if it isn't stored"""
+        try:
+            source_file, sentence_no, token_no = instance.split()
+        except (AttributeError, ValueError):
+            return None
+        source_file_id = self.tables["source_file"].ids.get(source_file)
+        if source_file_id is None:
+            return None
+        try:
+            key = self.row_key(source_file_id, sentence_no, token_no)
+        except ValueError:
+            # Not a number, or out of range: such an instance can't have been stored
+            return None
+        return self.rows.get(key)
+
+    def instance(self, row):
+        return self.get_field(row, "source_file") + " " + str(self.sentence_nos[row]) + " " + str(self.token_nos[row])
+
+    def sort_key(self, row):
+        return annotation.instance_sort_key(self.get_field(row, "source_file"), self.sentence_nos[row], self.token_nos[row])
+
+    def get_field(self, row, field):
+        return self.tables[field].strings[self.columns[field][row]]
+
+    def set_field(self, row, field, value):
+        self.columns[field][row] = self.tables[field].id(value)
+
+    def get_dependencies(self, row):
+        length = self.dep_lengths[row]
+        if length < 0:
+            return None
+        start = self.dep_starts[row]
+        return [self.deps.strings[i] for i in self.dep_pool[start:start + length]]
+
+    def set_dependencies(self, row, dependencies):
+        """Dependencies are appended to the pool; the run they replace is left unused"""
+        if dependencies is None:
+            self.dep_starts[row], self.dep_lengths[row] = 0, -1
+            return
+        self.dep_starts[row], self.dep_lengths[row] = len(self.dep_pool), len(dependencies)
+        self.dep_pool.extend(self.deps.id(dep) for dep in dependencies)
+
+    def add_row(self, ann):
+        """Append the fields of an annotation as a new row, returning its index"""
+        row = len(self.sentence_nos)
+        for field in self.STRING_FIELDS:
+            self.columns[field].append(self.tables[field].id(getattr(ann, field)))
+        self.sentence_nos.append(int(ann.sentence_no))
+        self.token_nos.append(int(ann.token_no))
+        self.dep_starts.append(0)
+        self.dep_lengths.append(-1)
+        self.set_dependencies(row, ann.dependencies)
+        return row
+
+    def __getitem__(self, instance):
+        row = self.find_row(instance)
+        if row is None:
+            raise KeyError(instance)
+        return StoredAnnotation(self, row)
+
+    def __setitem__(self, instance, ann):
+        row = self.find_row(instance)
+        if row is None:
+            source_file, sentence_no, token_no = instance.split()
+            row = self.add_row(ann)
+            self.rows[self.row_key(self.tables["source_file"].id(source_file), sentence_no, token_no)] = row
+            return
+        for field in self.STRING_FIELDS:
+            self.set_field(row, field, getattr(ann, field))
+        self.set_dependencies(row, ann.dependencies)
+
+    def __delitem__(self, instance):
+        row = self.find_row(instance)
+        if row is None:
+            raise KeyError(instance)
+        # the row itself stays in the columns, it just can't be reached anymore
+        source_file, sentence_no, token_no = instance.split()
+        del self.rows[self.row_key(self.tables["source_file"].ids[source_file], sentence_no, token_no)]
+
+    def __contains__(self, instance):
+        return self.find_row(instance) is not None
+
+    def __iter__(self):
+        for row in self.rows.values():
+            yield self.instance(row)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def stored_field(field):
+    return property(lambda self: self.store.get_field(self.row, field),
+                    lambda self, value: self.store.set_field(self.row, field, value))
+
+
+class StoredAnnotation(annotation.SemLinkAnnotation):
+    """View of one AnnotationStore row with the SemLinkAnnotation interface. Assigning a field writes it to the
+    store; dependencies are returned as a new list, so assign the whole list to change them"""
+
+    __slots__ = ("store", "row")
+    dep = None
+    input_line = None
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    source_file = stored_field("source_file")
+    verb = stored_field("verb")
+    vn_class = stored_field("vn_class")
+    fn_frame = stored_field("fn_frame")
+    pb_roleset = stored_field("pb_roleset")
+    on_group = stored_field("on_group")
+    source = stored_field("source")
+
+    def sort_key(self):
+        return self.store.sort_key(self.row)
+
+    @property
+    def sentence_no(self):
+        return str(self.store.sentence_nos[self.row])
+
+    @property
+    def token_no(self):
+        return str(self.store.token_nos[self.row])
+
+    @property
+    def instance(self):
+        return self.store.instance(self.row)
+
+    @property
+    def dependencies(self):
+        return self.store.get_dependencies(self.row)
+
+    @dependencies.setter
+    def dependencies(self, dependencies):
+        self.store.set_dependencies(self.row, dependencies)
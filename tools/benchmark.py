@@ -0,0 +1,342 @@
+"""benchmark.py
+
+Timing scripts for the lexical resource parsers and the SemLink build. The scaling benchmark takes its resource
+locations from config.py, so the numbers are for whatever versions of VerbNet, PropBank and OntoNotes are configured
+there. The suite runs on synthetic resources (see synthetic.py) of a given size instead, so it needs no data and its
+results can be compared across commits.
+
+    python benchmark.py 8                       # parser wall-clock time for 1, 2, 4 and 8 workers
+    python benchmark.py records                 # construction rate and size of the annotation record types,
+                                                # slotted and with a __dict__
+    python benchmark.py suite 1000 run.json     # parsers and build stages on 1000 synthetic lemmas, saved as json
+    python benchmark.py compare old.json new.json
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import platform
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+
+import verbnet
+import propbank
+import ontonotes
+import annotation
+import vnfn
+import mapping_bundle
+import decision_log
+import synthetic
+import SemLink
+import config
+
+# One line of each annotation format, with the token number templated
+ANNOTATION_LINES = {
+    annotation.VnAnnotation: "nw/wsj/00/wsj_0001.mrg 0 %d shake-v shake-26.5",
+    annotation.PbAnnotation: "nw/wsj/00/wsj_0001.mrg 0 %d gold shake-v shake.01 0:1-ARG0 2:1-ARG1",
+    annotation.OnAnnotation: "nw/wsj/00/wsj_0001.mrg 0 %d shake-v 1",
+    annotation.SemLinkAnnotation: "nw/wsj/00/wsj_0001.mrg 0 %d gold shake-v 26.5 Body_movement shake.01 1 0:1-ARG0=Agent",
+}
+
+
+def time_call(f, *args, **kwargs):
+    """Run f once, returning its result and the wall-clock time it took"""
+    start = time.perf_counter()
+    res = f(*args, **kwargs)
+    return res, time.perf_counter() - start
+
+
+def worker_counts(max_workers):
+    """1, 2, 4, ... up to and including max_workers"""
+    counts, n = [], 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    return counts + [max_workers]
+
+
+def parser_scaling(max_workers, vn_path=config.VN_RESOURCE_PATH, pb_path=config.PB_RESOURCE_PATH,
+                   on_path=config.ON_RESOURCE_PATH):
+    """Time each parser for an increasing number of workers. Returns {parser: {workers: seconds}}"""
+    parsers = {
+        "verbnet": lambda w: verbnet.VerbNetParser(directory=vn_path, workers=w),
+        "propbank": lambda w: propbank.PropBankParser(directory=pb_path, streaming=True, workers=w),
+        "ontonotes": lambda w: ontonotes.OntoNotesParser(directory=on_path, workers=w),
+    }
+    res = {}
+    for name, build in parsers.items():
+        res[name] = {}
+        for workers in worker_counts(max_workers):
+            _, res[name][workers] = time_call(build, workers)
+    return res
+
+
+class DictAnnotation(object):
+    """annotation.Annotation as it was before __slots__: the same fields, kept in a __dict__. The classes below
+    parse their lines like the annotation types of the same name, as a baseline for annotation_records"""
+
+    def __init__(self):
+        self.dep = self.source_file = self.sentence_no = self.token_no = self.verb = self.vn_class = \
+            self.fn_frame = self.pb_roleset = self.on_group = self.dependencies = self.instance = self.source = \
+            self._sort_key = None
+
+
+class DictVnAnnotation(DictAnnotation):
+    def __init__(self, line):
+        super().__init__()
+        attr_list = line.split()
+        self.source_file, self.sentence_no, self.token_no, self.instance = annotation.parse_instance(attr_list)
+        self.verb = annotation.parse_verb(attr_list[3])
+
+        vn_class = attr_list[4] if attr_list[4] != "None" else None
+        if vn_class and vn_class[0] not in [0-9]:
+            vn_class = "-".join(vn_class.split("-")[1:])
+        self.vn_class = vn_class
+        self.source = "vn"
+
+
+class DictPbAnnotation(DictAnnotation):
+    def __init__(self, line):
+        super().__init__()
+        attr_list = line.split()
+        self.source_file, self.sentence_no, self.token_no, self.instance = annotation.parse_instance(attr_list)
+        self.verb = annotation.parse_verb(attr_list[4])
+
+        self.pb_roleset = attr_list[5]
+        self.dependencies = attr_list[6:]
+        self.source = "pb"
+
+
+class DictOnAnnotation(DictAnnotation):
+    def __init__(self, line):
+        super().__init__()
+        attr_list = line.split()
+        self.source_file, self.sentence_no, self.token_no, self.instance = annotation.parse_instance(attr_list)
+        self.verb = annotation.parse_verb(attr_list[3])
+
+        self.on_group = attr_list[4]
+        self.source = "on"
+
+
+class DictSemLinkAnnotation(DictAnnotation):
+    def __init__(self, line):
+        super().__init__()
+        self.input_line = line.strip()
+        attr_list = line.split()
+
+        self.source_file, self.sentence_no, self.token_no, self.instance = annotation.parse_instance(attr_list)
+
+        if "-v" in attr_list[3] or attr_list[3] != "gold":
+            attr_list.insert(3, "gold")
+
+        self.verb = annotation.parse_verb(attr_list[4])
+        self.vn_class = attr_list[5]
+        self.fn_frame = attr_list[6]
+        self.pb_roleset = attr_list[7]
+        self.on_group = attr_list[8] if attr_list[8] != "null" else None
+        self.source = "old sl"
+
+        if len(attr_list) > 8:
+            self.dependencies = attr_list[9:]
+
+
+DICT_BASELINES = {
+    annotation.VnAnnotation: DictVnAnnotation,
+    annotation.PbAnnotation: DictPbAnnotation,
+    annotation.OnAnnotation: DictOnAnnotation,
+    annotation.SemLinkAnnotation: DictSemLinkAnnotation,
+}
+
+
+def annotation_records(n=200000, repeat=5):
+    """Objects parsed per second (best of repeat runs) and bytes allocated per live object (fields included) for
+    each annotation type, and for the same type with a __dict__ instead of __slots__ as a baseline. The garbage
+    collector is off while timing, like timeit does, otherwise its passes over the growing list dominate the
+    variation between runs. Returns {name: (objects/s, bytes/object)}"""
+    res = {}
+    for slotted, line in ANNOTATION_LINES.items():
+        lines = [line % i for i in range(n)]
+        for cls, name in ((DICT_BASELINES[slotted], slotted.__name__ + " (dict)"), (slotted, slotted.__name__)):
+            gc.disable()
+            try:
+                seconds = min(time_call(lambda: [cls(l) for l in lines])[1] for _ in range(repeat))
+            finally:
+                gc.enable()
+
+            tracemalloc.start()
+            kept = [cls(l) for l in lines]
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del kept
+            res[name] = (n / seconds, size / n)
+    return res
+
+
+def print_records(res):
+    for name, (rate, size) in res.items():
+        print("%-25s %10.0f objects/s %6.0f bytes/object" % (name, rate, size))
+
+
+def print_scaling(res):
+    for name, timings in res.items():
+        base = timings[min(timings)]
+        for workers, seconds in timings.items():
+            print("%-10s %3d workers %8.2fs  x%.2f" % (name, workers, seconds, base / seconds))
+
+
+def measure(f, trace_memory=False):
+    """Run f once. Returns its result and {seconds, cpu_seconds, max_rss_kb}, plus peak_bytes (the most memory
+    allocated by Python objects at any point during the call) when tracing memory. Tracing slows the call down"""
+    if trace_memory:
+        tracemalloc.start()
+    start, cpu_start = time.perf_counter(), time.process_time()
+    res = f()
+    stats = {"seconds": time.perf_counter() - start, "cpu_seconds": time.process_time() - cpu_start}
+    if trace_memory:
+        stats["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    # high-water mark of the whole process so far
+    stats["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return res, stats
+
+
+def use_synthetic_config(paths, cache_dir):
+    """Point the config settings read by the parsers and SemLink at a synthetic resource set. Returns the old
+    settings for restore_config"""
+    settings = {
+        "EXTERNAL_VN2PB_PATH": paths["external_vn2pb"],
+        "VN2FN_PATH": paths["vn_fn"],
+        "VN2FN_ROLES_PATH": paths["vn_fn_roles"],
+        "PB2VN_JSON_PATH": paths["pb_vn"],
+        "VN2FN_JSON_PATH": paths["vn_fn_json"],
+        "FN_LEMMA_INDEX_PATH": paths["fn_lemmas"],
+        "VN_CACHE_PATH": os.path.join(cache_dir, "verbnet.snapshot"),
+        "MAPPING_BUNDLE_PATH": os.path.join(cache_dir, "mappings.bundle"),
+    }
+    old = {name: getattr(config, name) for name in settings}
+    restore_config(settings)
+    return old
+
+
+def restore_config(settings):
+    for name, value in settings.items():
+        setattr(config, name, value)
+
+
+def parser_benchmarks(paths, cache_dir, trace_memory=False):
+    """Time every resource parser and mapping loader on a synthetic resource set. Returns {name: stats}"""
+    snapshot = os.path.join(cache_dir, "parsers.snapshot")
+    bundle = os.path.join(cache_dir, "parsers.bundle")
+    parsers = [
+        ("verbnet", lambda: verbnet.VerbNetParser(directory=paths["vn"])),
+        ("verbnet_snapshot_write", lambda: verbnet.VerbNetParser(directory=paths["vn"], cache_path=snapshot)),
+        ("verbnet_snapshot_load", lambda: verbnet.VerbNetParser(directory=paths["vn"], cache_path=snapshot)),
+        ("propbank", lambda: propbank.PropBankParser(directory=paths["pb"])),
+        ("propbank_streaming", lambda: propbank.PropBankParser(directory=paths["pb"], streaming=True)),
+        ("ontonotes", lambda: ontonotes.OntoNotesParser(directory=paths["on"])),
+        ("vnfn_load_mappings", lambda: vnfn.load_mappings(paths["vn_fn"])),
+        ("vnfn_load_element_mappings", lambda: vnfn.load_element_mappings(paths["vn_fn_roles"])),
+        ("mapping_bundle_build", lambda: mapping_bundle.build_bundle(bundle)),
+        ("mapping_bundle_open", lambda: mapping_bundle.MappingBundle(bundle).close()),
+    ]
+    res = {}
+    for name, build in parsers:
+        _, res[name] = measure(build, trace_memory)
+    return res
+
+
+def build_benchmarks(paths, output_file, workers=None, columnar=True, trace_memory=False):
+    """Time the stages of build_semlink on a synthetic resource set, including the release updates it leaves
+    commented out. Returns {stage: stats}, in stage order"""
+    res = {}
+
+    def stage(name, f):
+        value, res[name] = measure(f, trace_memory)
+        return value
+
+    decisions = decision_log.from_config(output_file + ".decisions")
+    semlink = stage("load", lambda: SemLink.SemLink(paths["instances"], vn_path=paths["vn"], pb_path=paths["pb"],
+                                                    on_path=paths["on"], version="2.0", columnar=columnar,
+                                                    decisions=decisions))
+    stage("update_verbnet_from_annotations", lambda: semlink.update_verbnet_from_annotations(paths["vn_anns"]))
+    stage("update_propbank_from_release", lambda: semlink.update_propbank_from_release(paths["pb_release"]))
+    stage("update_ontonotes_from_release", lambda: semlink.update_ontonotes_from_release(paths["on_release"]))
+    if workers and workers > 1:
+        stage("update_parallel", lambda: semlink.update_parallel(workers))
+    else:
+        stage("update_verbnet_from_propbank", semlink.update_verbnet_from_propbank)
+        stage("update_framenet_from_mappings", semlink.update_framenet_from_mappings)
+        stage("update_dependencies", semlink.update_dependencies)
+    stage("write", lambda: semlink.write(output_file=output_file))
+    stage("decision_log_close", decisions.close)
+    return res
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def suite(lemmas=1000, instances=None, workers=None, trace_memory=False, directory=None):
+    """Generate a synthetic resource set of the given size, then benchmark the parsers and the build on it.
+    Returns the results as a json-serializable dict"""
+    instances = instances or lemmas * 50
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = directory or tmp
+        paths = synthetic.generate(os.path.join(directory, "resources"), lemmas=lemmas, instances=instances)
+        cache_dir = os.path.join(directory, "cache")
+        old = use_synthetic_config(paths, cache_dir)
+        try:
+            parsers = parser_benchmarks(paths, cache_dir, trace_memory)
+            build = build_benchmarks(paths, os.path.join(directory, "semlink.out"), workers=workers,
+                                     trace_memory=trace_memory)
+        finally:
+            restore_config(old)
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "scale": {"lemmas": lemmas, "instances": instances, "workers": workers, "trace_memory": trace_memory},
+        "parsers": parsers,
+        "build": build,
+    }
+
+
+def print_suite(res):
+    for group in ("parsers", "build"):
+        for name, stats in res[group].items():
+            peak = " %8.1f MB peak" % (stats["peak_bytes"] / 2 ** 20) if "peak_bytes" in stats else ""
+            print("%-32s %8.3fs wall %8.3fs cpu%s" % (name, stats["seconds"], stats["cpu_seconds"], peak))
+
+
+def compare(old, new):
+    """Print the wall-clock time of every benchmark in two suite results side by side"""
+    for group in ("parsers", "build"):
+        for name, stats in new[group].items():
+            if name in old[group]:
+                before = old[group][name]["seconds"]
+                print("%-32s %8.3fs -> %8.3fs  x%.2f" % (name, before, stats["seconds"],
+                                                         before / stats["seconds"] if stats["seconds"] else 0))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "records":
+        print_records(annotation_records())
+    elif len(sys.argv) > 1 and sys.argv[1] == "suite":
+        res = suite(int(sys.argv[2]) if len(sys.argv) > 2 else 1000, trace_memory="--memory" in sys.argv)
+        print_suite(res)
+        if len(sys.argv) > 3 and not sys.argv[3].startswith("--"):
+            with open(sys.argv[3], "w") as f:
+                json.dump(res, f, indent=2)
+    elif len(sys.argv) > 1 and sys.argv[1] == "compare":
+        with open(sys.argv[2]) as old, open(sys.argv[3]) as new:
+            compare(json.load(old), json.load(new))
+    else:
+        print_scaling(parser_scaling(int(sys.argv[1]) if len(sys.argv) > 1 else 4))
@@ -0,0 +1,90 @@
+"""build_report.py
+
+Timings and outcome counters for a SemLink build. Each SemLink has a BuildReport that records the wall-clock and CPU
+time of every stage (loading a resource, an update pass, writing the output) and counts which branch each instance
+took in the updates, e.g. how many instances got a new VN class from PropBank or came out IN.
+
+    semlink = SemLink(...)
+    semlink.update_framenet_from_mappings()
+    print(semlink.report)
+    semlink.report.write("build_report.json")
+"""
+
+import json
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+
+class BuildReport(object):
+
+    def __init__(self, trace_memory=False):
+        """With trace_memory, the peak memory allocated during each stage is recorded as well. This slows the
+        build down considerably"""
+        self.trace_memory = trace_memory
+        # stage -> {"calls", "seconds", "cpu_seconds"[, "peak_bytes", "items"]}, in the order the stages first ran
+        self.stages = {}
+        self.counters = Counter()
+        # peak memory of the enclosing stages, tracemalloc only keeps a single peak
+        self.peaks = []
+        self.started_tracing = False
+
+    def count(self, outcome, n=1):
+        self.counters[outcome] += n
+
+    def items(self, name, n):
+        """Record that stage name processed n items, the report then gives its throughput"""
+        stats = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "cpu_seconds": 0.0})
+        stats["items"] = stats.get("items", 0) + n
+
+    def merge_counters(self, counters):
+        """Add counts from elsewhere, e.g. the report of a worker process"""
+        self.counters.update(counters)
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as stage name. A stage that runs more than once (or inside another stage, like a
+        resource loaded on first use) is added up"""
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+            if self.peaks:
+                self.peaks[-1] = max(self.peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self.peaks.append(0)
+        start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            stats = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "cpu_seconds": 0.0})
+            stats["calls"] += 1
+            stats["seconds"] += time.perf_counter() - start
+            stats["cpu_seconds"] += time.process_time() - cpu_start
+            if self.trace_memory:
+                peak = max(self.peaks.pop(), tracemalloc.get_traced_memory()[1])
+                stats["peak_bytes"] = max(stats.get("peak_bytes", 0), peak)
+                if self.peaks:
+                    self.peaks[-1] = max(self.peaks[-1], peak)
+                elif self.started_tracing:
+                    tracemalloc.stop()
+                    self.started_tracing = False
+
+    def as_dict(self):
+        return {"stages": self.stages, "counters": dict(sorted(self.counters.items()))}
+
+    def write(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def __str__(self):
+        lines = []
+        for name, stats in self.stages.items():
+            peak = " %8.1f MB peak" % (stats["peak_bytes"] / 2 ** 20) if "peak_bytes" in stats else ""
+            if "items" in stats and stats["seconds"]:
+                peak += " %10.0f items/s" % (stats["items"] / stats["seconds"])
+            lines.append("%-32s %8.2fs wall %8.2fs cpu%s" % (name, stats["seconds"], stats["cpu_seconds"], peak))
+        for outcome, n in sorted(self.counters.items()):
+            lines.append("%-48s %8d" % (outcome, n))
+        return "\n".join(lines)
@@ -11,6 +11,7 @@ including VN common objects and the old (1.2.2c) version of instances.
 """
 resource_root = "../lexical_resources/"
 other_root = "../other_resources/"
+instances_root = "../instances/"
 
 #Lexical resources: PB, VN, ON
 PB_RESOURCE_PATH = resource_root + "propbank-frames-master/frames/"
@@ -32,3 +33,21 @@ EXTERNAL_VN2PB_PATH = other_root + "external_vn2pb.json"       # manual curated
 OLD_VN2FN_PATH = other_root + "vn-fn.s"                        # old mappings, used for some updates
 VN2FN_PATH = other_root + "vn-fn2.s"                           # another version of mappings, in XML instead of json
 VN2FN_ROLES_PATH = other_root + "VN-FNRoleMapping.txt"         # Role mappings. Please note the roles file is extremely out of date. Updating is underway
+
+# Released SemLink mappings
+PB2VN_JSON_PATH = instances_root + "pb-vn2.json"               # PB roleset -> VN class -> PB arg -> VN role
+VN2FN_JSON_PATH = instances_root + "vn-fn2.json"               # "class-member" -> FN frames
+
+# Caches, rebuilt automatically whenever their source files change
+cache_root = "../cache/"
+VN_CACHE_PATH = cache_root + "verbnet.snapshot"                # compiled VerbNet classes, see VerbNetParser
+FN_LEMMA_INDEX_PATH = cache_root + "framenet_lemmas.json"      # FrameNet lemma -> frames, see framenet_index.py
+PB_FN_JOIN_PATH = cache_root + "pb_vn_fn.join"                 # PB roleset -> VN class, FN frame and role chains, see pb_fn_join.py
+MAPPING_BUNDLE_PATH = cache_root + "mappings.bundle"           # all of the mapping files above, see mapping_bundle.py
+
+# Decision log of the SemLink updates, see decision_log.py
+DECISION_LOG_PATH = "semlink.log"
+DECISION_LOG_ENABLED = True
+DECISION_LOG_CATEGORIES = None                                 # only log these categories (and those below them), None for all
+DECISION_LOG_DISABLED = ()                                     # never log these
+DECISION_LOG_SAMPLING = {}                                     # category -> keep only one in every n
@@ -0,0 +1,147 @@
+"""decision_log.py
+
+Audit trail of the decisions SemLink's updates make, one json object per line:
+
+    {"c":"fn_from_mappings.IN","i":"nw/wsj/00/wsj_0001.mrg 0 8","ann":["...", "shake", "26.5", ...],"frames":[...]}
+
+c is the decision category (the same names as the BuildReport counters), i the instance and ann the fields of the
+annotation after the decision, followed by whatever else the decision was based on. Logging a decision only takes a
+snapshot of those values. Lines are formatted and written in batches by a background thread.
+
+Categories can be switched off, or sampled: with sampling {"fn_from_mappings.updated": 100} only every 100th of those
+decisions is kept. A rule for a category also covers the categories below it, "vn_from_pb" covers "vn_from_pb.not_unique".
+"""
+
+import json
+import queue
+import atexit
+import threading
+
+import config
+
+BATCH_SIZE = 1024
+# Annotation fields kept with every decision
+SNAPSHOT_FIELDS = ("verb", "vn_class", "pb_roleset", "on_group", "fn_frame", "source")
+
+
+class DecisionLog(object):
+
+    def __init__(self, filename=None, enabled=True, categories=None, disabled=(), sampling=None):
+        """Decisions go to filename, or are kept in records for the caller to take if it is None (this is how
+        update_parallel gets them back from its workers). categories, if given, are the only ones logged; disabled
+        are never logged. sampling maps a category to n, to keep only one in every n of its decisions"""
+        self.filename = filename
+        self.enabled = enabled
+        self.categories = set(categories) if categories is not None else None
+        self.disabled = set(disabled)
+        self.sampling = dict(sampling or {})
+        # category -> keep one in how many (0 for none), resolved on first use
+        self.rates = {}
+        self.seen = {}
+        self.records = []
+
+        self.queue = None
+        self.writer = None
+
+    def rule(self, rules, category):
+        """The value rules gives the category or its closest parent, or None"""
+        while True:
+            if category in rules:
+                return rules[category] if isinstance(rules, dict) else True
+            if "." not in category:
+                return None
+            category = category.rsplit(".", 1)[0]
+
+    def rate(self, category):
+        if category not in self.rates:
+            if self.rule(self.disabled, category) or \
+                    (self.categories is not None and not self.rule(self.categories, category)):
+                self.rates[category] = 0
+            else:
+                self.rates[category] = self.rule(self.sampling, category) or 1
+        return self.rates[category]
+
+    def log(self, category, ann, **details):
+        """Record a decision about ann. details should be plain values (strings, numbers, lists of them) that are
+        not changed afterwards, since they are only formatted later"""
+        if not self.enabled:
+            return
+        rate = self.rates.get(category)
+        if rate is None:
+            rate = self.rate(category)
+        if rate != 1:
+            if not rate:
+                return
+            n = self.seen[category] = self.seen.get(category, 0) + 1
+            if n % rate:
+                return
+        self.records.append((category, ann.instance, [getattr(ann, field) for field in SNAPSHOT_FIELDS], details))
+        if self.filename and len(self.records) >= BATCH_SIZE:
+            self.flush()
+
+    def take(self):
+        """Remove and return the decisions logged so far"""
+        records, self.records = self.records, []
+        return records
+
+    def extend(self, records):
+        """Add decisions logged elsewhere, e.g. in a worker process"""
+        if self.enabled:
+            self.records.extend(records)
+            if self.filename and len(self.records) >= BATCH_SIZE:
+                self.flush()
+
+    def flush(self):
+        """Hand the pending decisions to the writer thread, starting it if needed"""
+        if not self.filename or not self.records:
+            return
+        if self.writer is None:
+            self.queue = queue.SimpleQueue()
+            self.writer = threading.Thread(target=write_records, args=(self.filename, self.queue), daemon=True)
+            self.writer.start()
+            atexit.register(self.close)
+        self.queue.put(self.take())
+
+    def close(self):
+        """Write out everything logged so far and stop the writer. Logging again starts a new one"""
+        self.flush()
+        if self.writer is not None:
+            self.queue.put(None)
+            self.writer.join()
+            atexit.unregister(self.close)
+            self.queue, self.writer = None, None
+
+
+def format_record(record):
+    category, instance, snapshot, details = record
+    line = {"c": category, "i": instance, "ann": snapshot}
+    line.update(details)
+    return json.dumps(line, separators=(",", ":"))
+
+
+def write_records(filename, batches):
+    """Writer thread: append batches of records to filename until a None batch arrives"""
+    with open(filename, "a") as f:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            f.write("\n".join(format_record(record) for record in batch) + "\n")
+
+
+def from_config(filename=None):
+    """A DecisionLog with the switches set in config, writing to filename"""
+    return DecisionLog(filename, enabled=config.DECISION_LOG_ENABLED, categories=config.DECISION_LOG_CATEGORIES,
+                       disabled=config.DECISION_LOG_DISABLED, sampling=config.DECISION_LOG_SAMPLING)
+
+
+# Shared by the SemLinks of a process, see default_log
+shared_log = None
+
+
+def default_log():
+    """The process wide log, writing to the file set in config"""
+    global shared_log
+    if shared_log is None:
+        shared_log = from_config(config.DECISION_LOG_PATH)
+    return shared_log
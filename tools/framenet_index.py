@@ -0,0 +1,50 @@
+"""framenet_index.py
+
+Lemma -> frame name lookup for FrameNet, built once from the FrameNet lexical units and stored as json. Once the
+index file exists, checking FrameNet frames doesn't need the NLTK corpus at all.
+"""
+
+import os
+import json
+
+import config
+
+
+class FrameNetLemmaIndex(object):
+    """Maps each lexical unit lemma ("shake" for "shake.v") to the frozenset of frames it evokes. Lemmas are
+    lowercased, lookups ignore case like NLTK's frames_by_lemma does"""
+
+    def __init__(self, index_path=config.FN_LEMMA_INDEX_PATH, rebuild=False):
+        """Load the index from index_path, building it from NLTK's FrameNet and writing it there if it
+        doesn't exist yet (or rebuild is set). With index_path=None the index is built and kept in memory"""
+        self.index_path = index_path
+        if index_path and os.path.exists(index_path) and not rebuild:
+            with open(index_path) as f:
+                self.frames = {}
+                # Index files written before lemmas were lowercased can have keys differing only in case
+                for lemma, frames in json.load(f).items():
+                    self.frames[lemma.lower()] = self.frames.get(lemma.lower(), frozenset()) | frozenset(frames)
+        else:
+            self.frames = build_lemma_index()
+            if index_path:
+                self.write(index_path)
+
+    def frame_names_by_lemma(self, lemma):
+        return self.frames.get(lemma.lower(), frozenset())
+
+    def write(self, index_path):
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        with open(index_path, "w") as f:
+            json.dump({lemma: sorted(frames) for lemma, frames in self.frames.items()}, f)
+
+
+def build_lemma_index(fn=None):
+    """Group the frame names of every FrameNet LU by its lemma"""
+    if fn is None:
+        from nltk.corpus import framenet as fn
+
+    index = {}
+    for lu in fn.lus():
+        lemma = lu.name.rsplit(".", 1)[0].lower()
+        index.setdefault(lemma, set()).add(lu.frame.name)
+    return {lemma: frozenset(frames) for lemma, frames in index.items()}
@@ -0,0 +1,248 @@
+"""instance_file.py
+
+Binary, random access version of the SemLink instance file. Instances are stored as fixed size records sorted by
+their numeric (document, sentence, token) key, so a single instance or all instances of a document can be found by
+binary search in a memory-mapped file, without reading or parsing the rest. The key only holds the document's
+number, so documents with the same number from different corpora ("cctv_0001.mrg", "wsj_0001.mrg") share a key
+range, in which records are told apart by their source file.
+
+Layout, all little endian:
+    header      magic, format version, record count, string count, dependency count
+    records     per instance: packed sort key, then string ids of the source file, verb, vn class, fn frame, pb roleset,
+                on group and source, and the start and length of its dependencies (length -1 for None)
+    deps        string ids of the dependencies of all records, back to back
+    offsets     start of each string in the blob, plus the end of the last one
+    blob        the utf-8 encoded strings. String id 0 stands for None
+
+    text_to_binary("semlink2.0", "semlink2.0.bin")
+    with InstanceFile("semlink2.0.bin") as instances:
+        instances["wsj_0001.mrg 0 8"].vn_class
+"""
+
+import mmap
+import struct
+import bisect
+
+import annotation
+
+MAGIC = b"SLBI"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIIII")
+RECORD = struct.Struct("<QIIIIIIIIi")
+UINT = struct.Struct("<I")
+RECORD_FIELDS = ("source_file", "verb", "vn_class", "fn_frame", "pb_roleset", "on_group", "source")
+NUMBER_MASK = (1 << annotation.NUMBER_BITS) - 1
+
+
+def write_instances(annotations, filename):
+    """Write an iterable of annotations to filename in the binary format. Of several annotations with the same
+    instance key only the last is written, as when loading a text file"""
+    strings, string_ids = [None], {None: 0}
+
+    def string_id(s):
+        if s not in string_ids:
+            string_ids[s] = len(strings)
+            strings.append(s)
+        return string_ids[s]
+
+    by_instance = {}
+    for ann in annotations:
+        dependencies = ann.dependencies
+        dep_ids = None if dependencies is None else [string_id(dep) for dep in dependencies]
+        # source file names break ties between documents with the same number
+        by_instance[ann.sort_key()[1], ann.source_file] = ([string_id(getattr(ann, field)) for field in RECORD_FIELDS],
+                                                          dep_ids)
+    records, deps = [], []
+    for key, source_file in sorted(by_instance):
+        ids, dep_ids = by_instance[key, source_file]
+        if dep_ids is None:
+            records.append((key, ids, 0, -1))
+        else:
+            records.append((key, ids, len(deps), len(dep_ids)))
+            deps.extend(dep_ids)
+
+    encoded = [s.encode("utf-8") for s in strings[1:]]
+    with open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(records), len(strings), len(deps)))
+        for key, ids, dep_start, dep_count in records:
+            f.write(RECORD.pack(key, *ids, dep_start, dep_count))
+        f.write(struct.pack("<%dI" % len(deps), *deps))
+        offset = 0
+        offsets = [0, 0]  # None is an empty string
+        for s in encoded:
+            offset += len(s)
+            offsets.append(offset)
+        f.write(struct.pack("<%dI" % len(offsets), *offsets))
+        f.write(b"".join(encoded))
+
+
+def text_to_binary(text_file, binary_file):
+    """Convert a text instance file (as written by SemLink.write) to the binary format"""
+    write_instances(annotation.iter_annotations(text_file), binary_file)
+
+
+def binary_to_text(binary_file, text_file):
+    """Write a binary instance file back out as text, in the order SemLink.write uses. Records are only ordered by
+    document number, so they are sorted by document name prefix first"""
+    with InstanceFile(binary_file) as instances, open(text_file, "w") as o:
+        order = sorted(range(len(instances)), key=lambda i: (
+            annotation.document_key(instances.field(i, "source_file"))[0], instances.sort_key(i),
+            instances.field(i, "source_file")))
+        for i in order:
+            o.write(BinaryAnnotation(instances, i).writable() + "\n")
+
+
+class SortKeys(object):
+    """Sequence of the record sort keys, read straight from the map, for bisect"""
+
+    def __init__(self, instances):
+        self.instances = instances
+
+    def __len__(self):
+        return len(self.instances)
+
+    def __getitem__(self, i):
+        return self.instances.sort_key(i)
+
+
+class InstanceFile(object):
+    """Read-only, memory-mapped binary instance file. Indexing by instance key returns a BinaryAnnotation view"""
+
+    def __init__(self, filename):
+        self.file = open(filename, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.n_records, self.n_strings, n_deps = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(filename + " is not a version %d binary instance file" % FORMAT_VERSION)
+
+        self.records_start = HEADER.size
+        self.deps_start = self.records_start + self.n_records * RECORD.size
+        self.offsets_start = self.deps_start + n_deps * UINT.size
+        self.blob_start = self.offsets_start + (self.n_strings + 1) * UINT.size
+        self.keys = SortKeys(self)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.n_records
+
+    def record(self, i):
+        """(sort key, string ids..., dependency start, dependency count) of record i"""
+        return RECORD.unpack_from(self.map, self.records_start + i * RECORD.size)
+
+    def sort_key(self, i):
+        return struct.unpack_from("<Q", self.map, self.records_start + i * RECORD.size)[0]
+
+    def raw_string(self, string_id):
+        """utf-8 bytes of a string as a memoryview into the map, without copying. Release it before closing"""
+        start, end = struct.unpack_from("<II", self.map, self.offsets_start + string_id * UINT.size)
+        return memoryview(self.map)[self.blob_start + start:self.blob_start + end]
+
+    def string(self, string_id):
+        if string_id == 0:
+            return None
+        start, end = struct.unpack_from("<II", self.map, self.offsets_start + string_id * UINT.size)
+        return self.map[self.blob_start + start:self.blob_start + end].decode("utf-8")
+
+    def field(self, i, field):
+        return self.string(self.record(i)[1 + RECORD_FIELDS.index(field)])
+
+    def dependencies(self, i):
+        dep_start, dep_count = self.record(i)[-2:]
+        if dep_count < 0:
+            return None
+        ids = struct.unpack_from("<%dI" % dep_count, self.map, self.deps_start + dep_start * UINT.size)
+        return [self.string(string_id) for string_id in ids]
+
+    def find(self, instance):
+        """Record number of an instance key ("wsj_0001.mrg 0 8"), or None. O(log n)"""
+        try:
+            source_file, sentence_no, token_no = instance.split()
+            key = annotation.instance_sort_key(source_file, sentence_no, token_no)[1]
+        except ValueError:
+            return None
+        i = bisect.bisect_left(self.keys, key)
+        while i < self.n_records and self.sort_key(i) == key:
+            if self.field(i, "source_file") == source_file:
+                return i
+            i += 1
+        return None
+
+    def get(self, instance, default=None):
+        i = self.find(instance)
+        return BinaryAnnotation(self, i) if i is not None else default
+
+    def __getitem__(self, instance):
+        i = self.find(instance)
+        if i is None:
+            raise KeyError(instance)
+        return BinaryAnnotation(self, i)
+
+    def __contains__(self, instance):
+        return self.find(instance) is not None
+
+    def __iter__(self):
+        for i in range(self.n_records):
+            yield BinaryAnnotation(self, i)
+
+    def scan_document(self, source_file):
+        """All instances of a document, in sentence and token order"""
+        doc_key = annotation.instance_sort_key(source_file, 0, 0)[1]
+        i = bisect.bisect_left(self.keys, doc_key)
+        end = bisect.bisect_left(self.keys, doc_key + (1 << 2 * annotation.NUMBER_BITS), lo=i)
+        for j in range(i, end):
+            if self.field(j, "source_file") == source_file:
+                yield BinaryAnnotation(self, j)
+
+
+def binary_field(field):
+    return property(lambda self: self.instances.field(self.index, field))
+
+
+class BinaryAnnotation(annotation.SemLinkAnnotation):
+    """Read-only view of one record of an InstanceFile with the SemLinkAnnotation interface. Fields are decoded
+    from the map when accessed"""
+
+    __slots__ = ("instances", "index")
+    dep = None
+    input_line = None
+
+    def __init__(self, instances, index):
+        self.instances = instances
+        self.index = index
+
+    source_file = binary_field("source_file")
+    verb = binary_field("verb")
+    vn_class = binary_field("vn_class")
+    fn_frame = binary_field("fn_frame")
+    pb_roleset = binary_field("pb_roleset")
+    on_group = binary_field("on_group")
+    source = binary_field("source")
+
+    def sort_key(self):
+        return annotation.document_key(self.source_file)[0], self.instances.sort_key(self.index)
+
+    @property
+    def sentence_no(self):
+        return str(self.instances.sort_key(self.index) >> annotation.NUMBER_BITS & NUMBER_MASK)
+
+    @property
+    def token_no(self):
+        return str(self.instances.sort_key(self.index) & NUMBER_MASK)
+
+    @property
+    def instance(self):
+        return self.source_file + " " + self.sentence_no + " " + self.token_no
+
+    @property
+    def dependencies(self):
+        return self.instances.dependencies(self.index)
@@ -0,0 +1,309 @@
+"""mapping_bundle.py
+
+All the mapping files SemLink reads at startup, compiled into one read-only file that is memory-mapped instead of
+parsed. Processes that open the bundle share its pages, rather than each building their own dicts from json and XML.
+
+A source file that doesn't exist is left out of the bundle, so e.g. SemLink.pb() works with only external_vn2pb
+present; its sections raise KeyError when used, and the bundle is rebuilt once the file appears.
+
+Every mapping is a section: a hash table over its entries, keys and json encoded values. Sections are read through
+BundleSection, a read-only Mapping that decodes values as they are looked up. The last VALUE_CACHE_SIZE values
+of each section stay decoded, which covers the repeated lookups of the same classes and rolesets an update makes
+while keeping memory bounded; a value that drops out is decoded again from the map, a json parse of a few
+hundred bytes.
+
+Layout, all little endian:
+    header      magic, format version, length of the directory
+    directory   json: section name -> (entries offset, entry count, slots offset, slot count), and the source manifest
+    per section entries: key offset, key length, value offset, value length, in the order of the source mapping
+                slots: entry number + 1 (0 for an empty slot), indexed by key hash with linear probing
+    blob        utf-8 keys and json values
+
+    bundle = load_bundle()
+    bundle["vn_fn"]["26.5-shake"]
+"""
+
+import os
+import json
+import mmap
+import struct
+import hashlib
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import vnfn
+import propbank
+import config
+
+MAGIC = b"SLMB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sII")
+ENTRY = struct.Struct("<IIII")
+SLOT = struct.Struct("<I")
+# Decoded values kept by each BundleSection
+VALUE_CACHE_SIZE = 1024
+# Stands for a key that isn't in a section, in BundleSection.values
+MISSING = object()
+
+
+def configured_sources():
+    """The mapping files in the bundle, as currently set in config"""
+    return {
+        "external_vn2pb": config.EXTERNAL_VN2PB_PATH,
+        "vn_fn": config.VN2FN_PATH,
+        "vn_fn_roles": config.VN2FN_ROLES_PATH,
+    }
+
+
+def key_hash(key):
+    """Stable across processes, unlike hash()"""
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def source_manifest(sources, previous=None):
+    """Map every source name to its (path, mtime, size, sha1), or None if the file doesn't exist. Hashes from
+    previous are reused for files whose mtime and size haven't changed"""
+    previous = previous or {}
+    manifest = {}
+    for name, path in sources.items():
+        if not os.path.exists(path):
+            manifest[name] = None
+            continue
+        stat = os.stat(path)
+        old = previous.get(name)
+        if old and old[0] == path and old[1] == stat.st_mtime_ns and old[2] == stat.st_size:
+            manifest[name] = old
+        else:
+            with open(path, "rb") as f:
+                manifest[name] = [path, stat.st_mtime_ns, stat.st_size, hashlib.sha1(f.read()).hexdigest()]
+    return manifest
+
+
+def external_sections(path):
+    external = propbank.ExternalVnPbMapping(path)
+    return {"vn2pb": external.vn2pb, "pb2vn": external.pb2vn, "numerical_vn2pb": external.numerical_vn2pb,
+            "numerical_pb2vn": external.numerical_pb2vn}
+
+
+# Source name -> function parsing the file the way SemLink and the parsers do, into section name -> dict
+SECTION_READERS = {
+    "external_vn2pb": external_sections,
+    "vn_fn": lambda path: {"vn_fn": vnfn.load_mappings(path)},
+    "vn_fn_roles": lambda path: {"vn_fn_roles": vnfn.load_element_mappings(mapping_file=path)},
+}
+
+
+def read_sections(sources):
+    """Parse the mapping files. Returns section name -> dict, without the sections of sources that don't exist, so
+    a bundle can be built for what is there and the missing files only fail when their sections are used"""
+    sections = {}
+    for name, path in sources.items():
+        if os.path.exists(path):
+            sections.update(SECTION_READERS[name](path))
+    return sections
+
+
+def build_bundle(bundle_path, sources=None):
+    """Compile the mapping files into a bundle. Written to a temporary file first, so a bundle that is already mapped
+    by another process is left intact"""
+    sources = sources or configured_sources()
+    manifest = source_manifest(sources)
+    blob = bytearray()
+    directory, tables = {}, []
+    offset = 0
+    for name, mapping in read_sections(sources).items():
+        entries = bytearray()
+        n_slots = 8
+        while n_slots < 2 * len(mapping):
+            n_slots *= 2
+        slots = [0] * n_slots
+        for i, (key, value) in enumerate(mapping.items()):
+            key = key.encode("utf-8")
+            value = json.dumps(value, separators=(",", ":")).encode("utf-8")
+            entries += ENTRY.pack(len(blob), len(key), len(blob) + len(key), len(value))
+            blob += key + value
+
+            slot = key_hash(key) & (n_slots - 1)
+            while slots[slot]:
+                slot = (slot + 1) & (n_slots - 1)
+            slots[slot] = i + 1
+        table = bytes(entries) + struct.pack("<%dI" % n_slots, *slots)
+        directory[name] = (offset, len(mapping), offset + len(entries), n_slots)
+        tables.append(table)
+        offset += len(table)
+
+    directory = json.dumps({"sections": directory, "manifest": manifest}).encode("utf-8")
+    os.makedirs(os.path.dirname(bundle_path) or ".", exist_ok=True)
+    tmp_path = bundle_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(directory)))
+        f.write(directory)
+        for table in tables:
+            f.write(table)
+        f.write(blob)
+    os.replace(tmp_path, bundle_path)
+
+
+class BundleSection(Mapping):
+    """One mapping of a bundle, with read-only dict access. Recently looked up values are returned as the same
+    object, so they must not be changed by the caller"""
+
+    def __init__(self, bundle, entries_start, n_entries, slots_start, n_slots, cache_size=VALUE_CACHE_SIZE):
+        self.bundle = bundle
+        self.entries_start = entries_start
+        self.n_entries = n_entries
+        self.slots_start = slots_start
+        self.n_slots = n_slots
+        # key -> decoded value, or MISSING for keys that aren't in the section, least recently used first
+        self.values = OrderedDict()
+        self.cache_size = cache_size
+
+    def entry(self, i):
+        return ENTRY.unpack_from(self.bundle.map, self.entries_start + i * ENTRY.size)
+
+    def key(self, i):
+        key_start, key_length, _, _ = self.entry(i)
+        start = self.bundle.blob_start + key_start
+        return self.bundle.map[start:start + key_length]
+
+    def find(self, key):
+        """Entry number of a key, or None"""
+        if not isinstance(key, str):
+            return None
+        key = key.encode("utf-8")
+        slot = key_hash(key) & (self.n_slots - 1)
+        while True:
+            i = SLOT.unpack_from(self.bundle.map, self.slots_start + slot * SLOT.size)[0]
+            if not i:
+                return None
+            if self.key(i - 1) == key:
+                return i - 1
+            slot = (slot + 1) & (self.n_slots - 1)
+
+    def lookup(self, key):
+        """The decoded value of key, or MISSING"""
+        try:
+            value = self.values[key]
+            self.values.move_to_end(key)
+            return value
+        except (KeyError, TypeError):
+            pass
+        i = self.find(key)
+        if i is None:
+            value = MISSING
+        else:
+            _, _, value_start, value_length = self.entry(i)
+            start = self.bundle.blob_start + value_start
+            value = json.loads(self.bundle.map[start:start + value_length])
+        if isinstance(key, str):
+            self.values[key] = value
+            if len(self.values) > self.cache_size:
+                self.values.popitem(last=False)
+        return value
+
+    def __getitem__(self, key):
+        value = self.lookup(key)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.lookup(key) is not MISSING
+
+    def __iter__(self):
+        for i in range(self.n_entries):
+            yield self.key(i).decode("utf-8")
+
+    def __len__(self):
+        return self.n_entries
+
+
+class BundledVnPbMapping(object):
+    """Stands in for propbank.ExternalVnPbMapping, with the four directions read from a bundle"""
+
+    def __init__(self, bundle):
+        self.vn2pb = bundle["vn2pb"]
+        self.pb2vn = bundle["pb2vn"]
+        self.numerical_vn2pb = bundle["numerical_vn2pb"]
+        self.numerical_pb2vn = bundle["numerical_pb2vn"]
+
+
+class MappingBundle(object):
+    """Read-only, memory-mapped bundle. Indexing by section name returns a BundleSection"""
+
+    def __init__(self, bundle_path):
+        self.file = open(bundle_path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, directory_length = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(bundle_path + " is not a version %d mapping bundle" % FORMAT_VERSION)
+
+        directory = json.loads(self.map[HEADER.size:HEADER.size + directory_length])
+        self.manifest = directory["manifest"]
+        tables_start = HEADER.size + directory_length
+        self.sections = {}
+        for name, (entries_start, n_entries, slots_start, n_slots) in directory["sections"].items():
+            self.sections[name] = BundleSection(self, tables_start + entries_start, n_entries,
+                                                tables_start + slots_start, n_slots)
+        self.blob_start = tables_start + sum(n_entries * ENTRY.size + n_slots * SLOT.size for _, n_entries, _, n_slots
+                                             in directory["sections"].values())
+
+    def __getitem__(self, name):
+        try:
+            return self.sections[name]
+        except KeyError:
+            raise KeyError("no %s section in the bundle, its source file was missing when it was built" % name)
+
+    def __contains__(self, name):
+        return name in self.sections
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def is_current(self, sources=None):
+        """Whether the bundle was built from the current contents of sources"""
+        sources = sources or configured_sources()
+        if set(sources) != set(self.manifest):
+            return False
+        return {name: entry and entry[3] for name, entry in source_manifest(sources, self.manifest).items()} == \
+            {name: entry and entry[3] for name, entry in self.manifest.items()}
+
+    def external_vn_pb(self):
+        return BundledVnPbMapping(self)
+
+
+# Bundles opened by load_bundle by (path, sources), shared by everything in the process
+bundles = {}
+
+
+def load_bundle(bundle_path=None, sources=None):
+    """Open the bundle at bundle_path, building it first if it doesn't exist or its sources changed. Both default to
+    what is set in config when the bundle is loaded"""
+    bundle_path = bundle_path or config.MAPPING_BUNDLE_PATH
+    sources = sources or configured_sources()
+    cache_key = (bundle_path, frozenset(sources.items()))
+    if cache_key in bundles:
+        return bundles[cache_key]
+
+    bundle = None
+    if os.path.exists(bundle_path):
+        try:
+            bundle = MappingBundle(bundle_path)
+        except (ValueError, struct.error, KeyError):
+            bundle = None
+        if bundle is not None and not bundle.is_current(sources):
+            bundle.close()
+            bundle = None
+    if bundle is None:
+        build_bundle(bundle_path, sources)
+        bundle = MappingBundle(bundle_path)
+    bundles[cache_key] = bundle
+    return bundle
@@ -5,29 +5,128 @@ so that programs can work with either resource as necessary
 """
 
 import os
+import re
 import bs4
+import warnings
+import multiprocessing
+from collections.abc import Mapping
 
 VN_RE = r"([1-9][0-9]?[0-9]?([.-][0-9]+)+)"
+INVENTORY_LEMMA = re.compile(r"""<inventory\b[^>]*?\blemma\s*=\s*["']([^"']*)["']""")
+COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+# Characters read from the top of an inventory file to find its lemma in lazy mode, before reading the rest
+INVENTORY_HEAD = 4096
 
 class OntoNotesParser(object):
     """Parse OntoNotes Sense grouping XML files, and turn them into a list of BeautifulSoup
     objects"""
 
-    def __init__(self, directory=None):
+    def __init__(self, directory=None, workers=None, lazy=False):
         """Take all verbnet files, if max_count is used then take the first max_count
-        files, if file_list is used, read the filenames from the file."""
+        files, if file_list is used, read the filenames from the file.
+
+        With workers > 1 the files are parsed in a pool of that many processes, and parsed_files
+        stays empty.
+
+        With lazy, nothing is parsed up front: an inventory file is parsed the first time one of its
+        lemma's groupings is looked up, through groupings, get_grouping or lemma_groupings. The lemma of a
+        file is read from its inventory tag without parsing it, so lookups find the same groupings as
+        without lazy; a file without one is filed under its name ("shake-v.xml" for "shake-v") with a
+        warning. parsed_files stays empty."""
         GROUPING_PATH = directory
         fnames = [f for f in os.listdir(GROUPING_PATH) if f.endswith(".xml")]
         self.filenames = [os.path.join(GROUPING_PATH, fname) for fname in fnames]
-        self.parsed_files = self.parse_files()
+        self.parsed_files = []
         self.frame_dict = {}
         self.groupings = {}
+        # Lemma -> {n: SenseGrouping}, and for lazy loading, lemma -> inventory files not parsed yet
+        self.lemma_index = {}
+        self.unparsed = {}
+        # PB roleset, VN class and FN frame -> the groupings mapped to it, see groupings_for
+        self.pb_index, self.vn_index, self.fn_index = {}, {}, {}
+
+        self.lazy = lazy
+        if lazy:
+            for fname, path in zip(fnames, self.filenames):
+                lemma = inventory_lemma(path)
+                if lemma is None:
+                    lemma = fname[:-len(".xml")]
+                    warnings.warn("%s has no inventory lemma, its groupings are filed under %s" % (path, lemma))
+                self.unparsed.setdefault(lemma, []).append(path)
+            self.groupings = LazyGroupings(self)
+            return
 
+        if workers and workers > 1:
+            with multiprocessing.Pool(workers) as pool:
+                for file_groupings in pool.map(parse_grouping_file, self.filenames):
+                    self.add_groupings(file_groupings)
+            return
+
+        self.parsed_files = self.parse_files()
         for parse in self.parsed_files:
-            for sense in parse.findAll("sense"):
-                on_sense = SenseGrouping(sense, parse.find("inventory").get("lemma"))
+            self.add_groupings(groupings_from_soup(parse))
+
+    def add_groupings(self, file_groupings):
+        for on_sense in file_groupings:
+            if not self.lazy:
                 self.groupings[on_sense.ID] = on_sense
+            self.lemma_index.setdefault(on_sense.lemma, {})[on_sense.n] = on_sense
+            for index, keys in ((self.pb_index, on_sense.pb_rolesets()), (self.vn_index, on_sense.vn_classes()),
+                                (self.fn_index, on_sense.fn_frames())):
+                for key in keys:
+                    index.setdefault(key, []).append(on_sense)
+
+    def lemma_groupings(self, lemma):
+        """The groupings of lemma ("shake-v") by sense number, parsing its inventory first in lazy mode"""
+        for path in self.unparsed.pop(lemma, ()):
+            self.add_groupings(parse_grouping_file(path, lemma))
+        return self.lemma_index.get(lemma, {})
 
+    def get_grouping(self, lemma, n):
+        """The SenseGrouping numbered n of lemma, or None"""
+        return self.lemma_groupings(lemma).get(n)
+
+    def has_grouping(self, lemma, n):
+        return self.get_grouping(lemma, n) is not None
+
+    def load_all(self):
+        """Parse every inventory not parsed yet, in lazy mode"""
+        for lemma in list(self.unparsed):
+            self.lemma_groupings(lemma)
+
+    def groupings_for(self, pb=None, vn=None, fn=None):
+        """The groupings mapped to all of the given PB roleset ("shake.01"), VN class ("26.5") and FN frame. In lazy
+        mode every inventory is parsed first"""
+        self.load_all()
+        matches = None
+        for index, key in ((self.pb_index, pb), (self.vn_index, vn_number(vn) if vn else None), (self.fn_index, fn)):
+            if key is None:
+                continue
+            found = index.get(key, [])
+            matches = found if matches is None else [on_sense for on_sense in matches if on_sense in found]
+        return list(matches or [])
+
+    def check_groupings(self, annotations):
+        """Cross-validate the ON groups of annotations against their PB rolesets and VN classes, with one lemma index
+        lookup per annotation. Returns (annotation, problem) pairs, problem being "missing_group" for a group that
+        isn't in OntoNotes, or "pb_mismatch" / "vn_mismatch" for a group mapped to other rolesets or classes. A VN
+        class matches the classes it is a subclass of"""
+        problems = []
+        for ann in annotations:
+            if not ann.on_group:
+                continue
+            on_sense = self.get_grouping(ann.verb + "-v", ann.on_group)
+            if on_sense is None:
+                problems.append((ann, "missing_group"))
+                continue
+            rolesets = on_sense.pb_rolesets()
+            if rolesets and ann.pb_roleset and ann.pb_roleset not in rolesets:
+                problems.append((ann, "pb_mismatch"))
+            vn_classes = on_sense.vn_classes()
+            if vn_classes and ann.vn_class and not any(ann.vn_class == vn_class or ann.vn_class.startswith(vn_class + "-")
+                                                       for vn_class in vn_classes):
+                problems.append((ann, "vn_mismatch"))
+        return problems
 
     def parse_files(self):
         """Parse a list of XML files using BeautifulSoup. Returns list of parsed
@@ -37,6 +136,66 @@ class OntoNotesParser(object):
             parsed_files.append(bs4.BeautifulSoup(open(fname, encoding="utf-8"), "lxml-xml"))
         return parsed_files
 
+class LazyGroupings(Mapping):
+    """groupings of a lazy OntoNotesParser: grouping ID ("shake-v-1") -> SenseGrouping, looked up in the lemma
+    index. Iterating over it parses every inventory"""
+
+    def __init__(self, parser):
+        self.parser = parser
+
+    def __getitem__(self, grouping_id):
+        lemma, _, n = grouping_id.rpartition("-")
+        on_sense = self.parser.get_grouping(lemma, n)
+        if on_sense is None or on_sense.ID != grouping_id:
+            raise KeyError(grouping_id)
+        return on_sense
+
+    def __contains__(self, grouping_id):
+        try:
+            self[grouping_id]
+        except (KeyError, TypeError, AttributeError):
+            return False
+        return True
+
+    def __iter__(self):
+        self.parser.load_all()
+        for lemma_groupings in list(self.parser.lemma_index.values()):
+            for on_sense in lemma_groupings.values():
+                yield on_sense.ID
+
+    def __len__(self):
+        self.parser.load_all()
+        return sum(len(lemma_groupings) for lemma_groupings in self.parser.lemma_index.values())
+
+
+def vn_number(vn_class):
+    """The numerical part of a VN class as written in a mapping: 26.5 for shake-26.5"""
+    match = re.search(VN_RE, vn_class)
+    return match.group(1) if match else vn_class.strip()
+
+
+def inventory_lemma(fname):
+    """The lemma attribute of an inventory file, found with a regex instead of parsing the file, or None"""
+    with open(fname, encoding="utf-8") as f:
+        text = f.read(INVENTORY_HEAD)
+        match = INVENTORY_LEMMA.search(COMMENT.sub("", text))
+        if not match:
+            text += f.read()
+            match = INVENTORY_LEMMA.search(COMMENT.sub("", text))
+    return match.group(1) if match else None
+
+
+def groupings_from_soup(parse, default_lemma=None):
+    """All sense groupings of a parsed inventory file, under default_lemma if the inventory has no lemma"""
+    lemma = parse.find("inventory").get("lemma") or default_lemma
+    return [SenseGrouping(sense, lemma) for sense in parse.findAll("sense")]
+
+
+def parse_grouping_file(fname, default_lemma=None):
+    """Parse a single inventory file into its sense groupings, for use in a worker pool"""
+    return groupings_from_soup(bs4.BeautifulSoup(open(fname, encoding="utf-8"), "lxml-xml"), default_lemma)
+
+
 class SenseGrouping():
     def __init__(self, soup, file_lemma):
         self.lemma = file_lemma
@@ -54,3 +213,12 @@ class SenseGrouping():
             self.fn_mappings = mappings.find("fn").text.split(",")
 
         self.ID = file_lemma + "-" + soup.get("n")
+
+    def pb_rolesets(self):
+        return [roleset.strip() for roleset in self.pb_mappings or [] if roleset.strip()]
+
+    def vn_classes(self):
+        return [vn_number(vn_class) for vn_class in self.vn_mappings or [] if vn_class.strip()]
+
+    def fn_frames(self):
+        return [frame.strip() for frame in self.fn_mappings or [] if frame.strip()]
@@ -0,0 +1,180 @@
+"""pb_fn_join.py
+
+PropBank -> VerbNet -> FrameNet, joined ahead of time. For every PB roleset: the VN classes it maps to in pb-vn2.json,
+the FN frames each class maps to for the roleset's lemma in vn-fn2.json, and for each PB argument its VN role and the
+FN frame element that role maps to in VN-FNRoleMapping.txt:
+
+    join = PbFnJoin()
+    join["abduct.01"]
+    [("10.5", "Kidnapping", {"ARG0": ("agent", "Perpetrator"), "ARG1": ("theme", "Victim")})]
+
+The table is stored in the cache together with the parsed mapping files and a manifest of them. When one of the
+mapping files changes, only that file is parsed again, and only the rolesets that read a changed entry are joined again.
+"""
+
+import os
+import json
+import pickle
+import hashlib
+
+import vnfn
+import config
+
+JOIN_FORMAT = 1
+SOURCES = ("pb_vn", "vn_fn", "roles")
+
+
+def load_source(name, path):
+    """pb_vn: roleset -> VN class -> PB arg -> VN role, vn_fn: "class-member" -> FN frames,
+    roles: "class;frame" -> lowercased VN role -> FN frame element"""
+    if name == "roles":
+        return vnfn.load_element_mappings(path)
+    with open(path) as f:
+        return json.load(f)
+
+
+def manifest_entry(path, previous=None):
+    """(mtime, size, sha1) of a file. The hash of previous is reused if the mtime and size haven't changed"""
+    stat = os.stat(path)
+    if previous and previous[0] == stat.st_mtime_ns and previous[1] == stat.st_size:
+        return previous
+    with open(path, "rb") as f:
+        return stat.st_mtime_ns, stat.st_size, hashlib.sha1(f.read()).hexdigest()
+
+
+def changed_keys(old, new):
+    return {k for k in old.keys() | new.keys() if old.get(k) != new.get(k)}
+
+
+def class_ancestors(vn_class):
+    """The class and the classes it is a subclass of, most specific first: 29.2-1-1, 29.2-1, 29.2"""
+    parts = vn_class.split("-")
+    return ["-".join(parts[:i]) for i in range(len(parts), 0, -1)]
+
+
+def roleset_lemma(roleset):
+    return roleset.rsplit(".", 1)[0]
+
+
+def role_mapping(roles, vn_class, fn_frame):
+    """VN role -> FN frame element for a class and frame. Role mappings are mostly given for top level classes, so
+    a subclass uses the mapping of its closest ancestor that has one"""
+    for ancestor in class_ancestors(vn_class):
+        mapping = roles.get(ancestor + ";" + fn_frame)
+        if mapping is not None:
+            return mapping
+    return {}
+
+
+def join_roleset(roleset, vn_classes, vn_fn, roles):
+    """[(vn class, fn frame, {pb arg: (vn role, fn frame element)})] for a roleset. The frame element is None for
+    roles without a mapping, and classes with no frame for the roleset's lemma are left out"""
+    lemma = roleset_lemma(roleset)
+    chains = []
+    for vn_class, args in vn_classes.items():
+        for fn_frame in vn_fn.get(vn_class + "-" + lemma, []):
+            fn_roles = role_mapping(roles, vn_class, fn_frame)
+            chains.append((vn_class, fn_frame,
+                           {arg: (vn_role, fn_roles.get(vn_role.lower())) for arg, vn_role in args.items()}))
+    return chains
+
+
+def join_dependencies(roleset, vn_classes, vn_fn):
+    """(source, key) of every mapping entry join_roleset reads for a roleset, present or not"""
+    lemma = roleset_lemma(roleset)
+    deps = {("pb_vn", roleset)}
+    for vn_class in vn_classes:
+        vn_fn_key = vn_class + "-" + lemma
+        deps.add(("vn_fn", vn_fn_key))
+        for fn_frame in vn_fn.get(vn_fn_key, []):
+            deps.update(("roles", ancestor + ";" + fn_frame) for ancestor in class_ancestors(vn_class))
+    return deps
+
+
+class PbFnJoin(object):
+    """Roleset -> list of (vn class, fn frame, {pb arg: (vn role, fn frame element)}), see join_roleset.
+    Rolesets without any FN frame map to an empty list"""
+
+    def __init__(self, cache_path=None, pb_vn_path=None, vn_fn_path=None, roles_path=None):
+        """Paths default to those set in config when the join is created. cache_path=False keeps the table in
+        memory only"""
+        if cache_path is None:
+            cache_path = config.PB_FN_JOIN_PATH
+        self.paths = {"pb_vn": pb_vn_path or config.PB2VN_JSON_PATH, "vn_fn": vn_fn_path or config.VN2FN_JSON_PATH,
+                      "roles": roles_path or config.VN2FN_ROLES_PATH}
+        self.manifest = {}
+        self.sources = {name: {} for name in SOURCES}
+        self.table = {}
+
+        if cache_path:
+            self.load(cache_path)
+        cached_manifest = dict(self.manifest)
+        # rolesets joined again by this update, all of them if there was no usable cache
+        self.rejoined = self.update()
+        if cache_path and (self.rejoined or self.manifest != cached_manifest):
+            self.write(cache_path)
+
+    def __getitem__(self, roleset):
+        return self.table.get(roleset, [])
+
+    def __contains__(self, roleset):
+        return roleset in self.table
+
+    def __iter__(self):
+        return iter(self.table)
+
+    def __len__(self):
+        return len(self.table)
+
+    def fn_frames(self, roleset):
+        return [fn_frame for _, fn_frame, _ in self[roleset]]
+
+    def load(self, cache_path):
+        """Take the sources, manifest and table from a cache written by write. Returns False if there is no cache, or
+        it was built from other files or by another version of this module"""
+        if not os.path.exists(cache_path):
+            return False
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return False
+        if cached.get("format") != JOIN_FORMAT or cached.get("paths") != self.paths:
+            return False
+        self.manifest, self.sources, self.table = cached["manifest"], cached["sources"], cached["table"]
+        return True
+
+    def write(self, cache_path):
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"format": JOIN_FORMAT, "paths": self.paths, "manifest": self.manifest,
+                         "sources": self.sources, "table": self.table}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+    def update(self):
+        """Parse the mapping files that changed since the table was built and join the rolesets that depend on a
+        changed entry again. Returns the set of rolesets joined again"""
+        changed = set()
+        for name in SOURCES:
+            entry = manifest_entry(self.paths[name], self.manifest.get(name))
+            if self.manifest.get(name) is not None and entry[2] == self.manifest[name][2]:
+                self.manifest[name] = entry
+                continue
+            source = load_source(name, self.paths[name])
+            changed.update((name, key) for key in changed_keys(self.sources[name], source))
+            self.sources[name], self.manifest[name] = source, entry
+        if not changed:
+            return set()
+
+        pb_vn, vn_fn, roles = (self.sources[name] for name in SOURCES)
+        rejoined = set()
+        for roleset, vn_classes in pb_vn.items():
+            if not changed.isdisjoint(join_dependencies(roleset, vn_classes, vn_fn)):
+                self.table[roleset] = join_roleset(roleset, vn_classes, vn_fn, roles)
+                rejoined.add(roleset)
+        for roleset in list(self.table):
+            if roleset not in pb_vn:
+                del self.table[roleset]
+                rejoined.add(roleset)
+        return rejoined
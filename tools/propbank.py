@@ -8,6 +8,8 @@ import os
 import bs4
 import re
 import json
+import multiprocessing
+from lxml import etree
 import config
 import verbnet
 
@@ -18,23 +20,35 @@ class PropBankParser(object):
     """Parse PropBank XML files, and turn them into a list of BeautifulSoup
     objects"""
 
-    def __init__(self, directory=None, version="unified"):
+    def __init__(self, directory=None, version="unified", streaming=False, workers=None):
+        """If streaming is set, frame files are read with lxml's iterparse and each roleset is dropped as
+        soon as its fields are extracted, so neither parsed_files nor the rolesets keep any soup around.
+
+        With workers > 1 the frame files are streamed in a pool of that many processes instead, which
+        implies streaming"""
         PROPBANK_PATH = directory
         fnames = [f for f in os.listdir(PROPBANK_PATH) if f.endswith(".xml")]
         self.filenames = [os.path.join(PROPBANK_PATH, fname) for fname in fnames]
         self.version = version
-        self.vn2pb = json.load(open(config.EXTERNAL_VN2PB_PATH))
-        self.pb2vn = {}
-        for key in self.vn2pb:
-            for value in self.vn2pb[key]:
-                if value not in self.pb2vn:
-                    self.pb2vn[value] = []
-                self.pb2vn[value].append(key)
+        external_mapping = external_vn_pb_mapping()
+        self.vn2pb = external_mapping.vn2pb
+        self.pb2vn = external_mapping.pb2vn
 
-        self.parsed_files = self.parse_files()
+        self.streaming = streaming or bool(workers and workers > 1)
+        self.parsed_files = [] if self.streaming else self.parse_files()
         self.frame_dict = {}
         self.rolesets = {}
 
+        if workers and workers > 1:
+            with multiprocessing.Pool(workers) as pool:
+                for file_rolesets in pool.starmap(parse_roleset_file, [(fname, version) for fname in self.filenames]):
+                    for pb_roleset in file_rolesets:
+                        self.rolesets[pb_roleset.ID] = pb_roleset
+        elif streaming:
+            for fname in self.filenames:
+                for pb_roleset in iter_rolesets(fname, version):
+                    self.rolesets[pb_roleset.ID] = pb_roleset
+
         for parse in self.parsed_files:
             for roleset in parse.findAll("roleset"):
                 pb_roleset = PropBankRoleset(roleset, version)
@@ -49,7 +63,7 @@ class PropBankParser(object):
         return parsed_files
 
     def get_pb_vn_mappings(self, verbnet):
-        vn_members = [member.name for member in verbnet.get_members()]
+        vn_members = set(verbnet.member_index)
         res = {}
 
         # Initial population of rolesets
@@ -79,10 +93,14 @@ class PropBankParser(object):
 
         # Filling in role mappings from identical roleset mappings
         # Implements the assumption that if two PB rolesets for the same verb map to the same class,
-        # their role mappings will also be identical
+        # their role mappings will also be identical. Only rolesets of the same verb are compared,
+        # in the same order as a loop over all pairs would, so the result doesn't change
+        lemma_groups = {}
         for roleset in res:
-            for roleset2 in res:
-                if roleset.split(".")[0] == roleset2.split(".")[0]:
+            lemma_groups.setdefault(roleset.split(".")[0], []).append(roleset)
+        for group in lemma_groups.values():
+            for roleset in group:
+                for roleset2 in group:
                     for mapping in res[roleset]:
                         if mapping in res[roleset2]:
                             for arg in res[roleset][mapping]:
@@ -98,6 +116,46 @@ class PropBankParser(object):
         print (mapping_dict)
 
 
+class ExternalVnPbMapping(object):
+    """Both directions of the curated VN -> PB mapping file. vn2pb/pb2vn are keyed by the classes as they
+    appear in the file ("turn-26.6.1"), numerical_vn2pb/numerical_pb2vn by their numerical IDs ("26.6.1")"""
+
+    def __init__(self, filename=None):
+        self.vn2pb = json.load(open(filename or config.EXTERNAL_VN2PB_PATH))
+        self.pb2vn = {}
+        for key in self.vn2pb:
+            for value in self.vn2pb[key]:
+                if value not in self.pb2vn:
+                    self.pb2vn[value] = []
+                self.pb2vn[value].append(key)
+
+        self.numerical_vn2pb = {"-".join(k.split("-")[1:]): self.vn2pb[k] for k in self.vn2pb}
+        self.numerical_pb2vn = {}
+        for vnc in self.numerical_vn2pb:
+            for roleset in self.numerical_vn2pb[vnc]:
+                vn_classes = self.numerical_pb2vn.setdefault(roleset, [])
+                # a roleset listed twice under one class still maps to it once
+                if not vn_classes or vn_classes[-1] != vnc:
+                    vn_classes.append(vnc)
+
+
+external_mappings = {}
+
+
+def external_vn_pb_mapping(filename=None):
+    """Load the external VN-PB mapping, shared by everything in the process that reads the same file. Without a
+    filename, the one currently set in config is used"""
+    filename = filename or config.EXTERNAL_VN2PB_PATH
+    if filename not in external_mappings:
+        external_mappings[filename] = ExternalVnPbMapping(filename)
+    return external_mappings[filename]
+
+
+def use_external_mapping(filename, mapping):
+    """Have parsers that read filename use a mapping that is already loaded, such as one from a mapping bundle"""
+    external_mappings[filename] = mapping
+
+
 class AbstractXML(object):
     """Abstract class to be inherited by other classes that share the same
     features"""
@@ -145,6 +203,42 @@ class PropBankRoleset(AbstractXML):
             except AttributeError as e:
                 pass
 
+    @classmethod
+    def from_element(cls, element, version="unified"):
+        """Build a roleset from an lxml element instead of a soup, extracting the same fields as __init__.
+        No reference to the element is kept"""
+        roleset = cls.__new__(cls)
+        roleset.soup = None
+        roleset.ID = element.get("id")
+        roleset.name, roleset.framenet, roleset.vnc = None, [], []
+
+        roleset.role_mappings = {}
+        for role in element.iter("role"):
+            role_number = "ARG" + role.get("n")
+            roleset.role_mappings[role_number] = {}
+            for vn_role in role.iter("vnrole"):
+                roleset.role_mappings[role_number][vn_role.get("vncls")] = vn_role.get("vntheta").lower()
+
+        if version == "unified":
+            roleset.name = element.get("name")
+            # As in __init__: get_category on a non-empty alias list gives [], on an empty one it falls
+            # back to the roleset's own attributes
+            if next(element.iter("alias"), None) is None:
+                roleset.framenet = element.get("framenet")
+                roleset.vnc = element.get("verbnet")
+            if not roleset.vnc:
+                vnc_cands = set()
+                for note in element.iter("note"):
+                    vnc_cands.update([g[0] for g in re.findall(VN_RE, "".join(note.itertext()))])
+                for vnrole in element.iter("vnrole"):
+                    vnc_cands.add(vnrole.get("vncls"))
+                roleset.vnc = vnc_cands
+        else:
+            roleset.name = element.get("name")
+            roleset.framenet = element.get("framnet")
+            roleset.vnc = element.get("vncls")
+        return roleset
+
     def __repr__(self):
         return str([self.ID, self.framenet, self.vnc, self.name])
 
@@ -174,8 +268,23 @@ class PropBankRoleset(AbstractXML):
             return
 
 
+def iter_rolesets(fname, version="unified"):
+    """Stream the rolesets of a single frame file, clearing each element once it has been extracted"""
+    for _, element in etree.iterparse(fname, events=("end",), tag="roleset"):
+        yield PropBankRoleset.from_element(element, version)
+        element.clear()
+        # Drop the already processed siblings as well, otherwise the emptied elements pile up in the root
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
+def parse_roleset_file(fname, version="unified"):
+    """List the rolesets of a single frame file, for use in a worker pool"""
+    return list(iter_rolesets(fname, version))
+
+
 def test_vn_compatability(vn_path=config.VN_RESOURCE_PATH, mappings_path="../instances/pb-vn2.json"):
-    vn = verbnet.VerbNetParser(directory=vn_path)
+    vn = verbnet.VerbNetParser(directory=vn_path, cache_path=config.VN_CACHE_PATH)
     with open(mappings_path) as f:
         pb2vn = json.load(f)
 
@@ -185,8 +294,8 @@ def test_vn_compatability(vn_path=config.VN_RESOURCE_PATH, mappings_path="../ins
 
 
 def generate(vn_path=config.VN_RESOURCE_PATH, pb_path=config.PB_RESOURCE_PATH):
-    vn = verbnet.VerbNetParser(directory=vn_path)
-    pb = PropBankParser(directory=pb_path)
+    vn = verbnet.VerbNetParser(directory=vn_path, cache_path=config.VN_CACHE_PATH)
+    pb = PropBankParser(directory=pb_path, streaming=True)
 
     res = pb.get_pb_vn_mappings(vn)
     json.dump(res, open("../instances/pb-vn2.json", "w"))
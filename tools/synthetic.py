@@ -0,0 +1,217 @@
+"""synthetic.py
+
+Generates a small, self-consistent stand-in for the lexical resources and annotation releases, for benchmarking
+without the real data. Every lemma "verbN" is a member of one VerbNet class, has two PropBank rolesets and two
+OntoNotes sense groups, and evokes the FrameNet frames its class maps to. The generated files use the same formats as
+the real ones, so the parsers, the mapping loaders and the SemLink updates all run on them unchanged.
+
+    paths = generate("/tmp/synthetic", lemmas=1000, instances=50000)
+    verbnet.VerbNetParser(directory=paths["vn"])
+"""
+
+import os
+import json
+import random
+
+VN_CLASS = '''<?xml version="1.0" encoding="UTF-8"?>
+<VNCLASS ID="{id}">
+  <MEMBERS>{members}</MEMBERS>
+  <THEMROLES>
+    <THEMROLE type="Agent"><SELRESTRS logic="or"><SELRESTR Value="+" type="animate"/><SELRESTR Value="+" type="organization"/></SELRESTRS></THEMROLE>
+    <THEMROLE type="Theme"><SELRESTRS/></THEMROLE>
+  </THEMROLES>
+  <FRAMES>{frames}</FRAMES>
+  <SUBCLASSES>
+    <VNSUBCLASS ID="{id}-1">
+      <MEMBERS>{submembers}</MEMBERS>
+      <THEMROLES/>
+      <FRAMES>{frames}</FRAMES>
+      <SUBCLASSES/>
+    </VNSUBCLASS>
+  </SUBCLASSES>
+</VNCLASS>
+'''
+
+VN_FRAME = '''
+    <FRAME><DESCRIPTION descriptionNumber="0.2" primary="NP V NP" secondary="Basic Transitive" xtag="0.2"/>
+      <EXAMPLES><EXAMPLE>Bill {verb}ed the ball.</EXAMPLE></EXAMPLES>
+      <SYNTAX><NP value="Agent"><SYNRESTRS/></NP><VERB/><NP value="Theme"><SYNRESTRS/></NP></SYNTAX>
+      <SEMANTICS><PRED value="motion"><ARGS><ARG type="Event" value="during(E)"/><ARG type="ThemRole" value="Theme"/></ARGS></PRED>
+      <PRED value="cause"><ARGS><ARG type="ThemRole" value="Agent"/><ARG type="Event" value="E"/></ARGS></PRED></SEMANTICS>
+    </FRAME>'''
+
+VN_MEMBER = '<MEMBER name="{verb}" wn="{verb}%2:38:00" grouping="{verb}.01" features="" verbnet_key="{verb}#1"/>'
+
+PB_FRAMESET = '''<?xml version="1.0" encoding="UTF-8"?>
+<frameset><predicate lemma="{verb}">
+<roleset id="{verb}.01" name="move {verb}"><aliases><alias framenet="{frame}" pos="v" verbnet="{vn_class}">{verb}</alias></aliases>
+<roles><role descr="agent" f="PAG" n="0"><vnrole vncls="{vn_class}" vntheta="Agent"/></role>
+<role descr="thing" f="PPT" n="1"><vnrole vncls="{vn_class}" vntheta="Theme"/></role></roles>
+<example><text>Bill {verb}ed the ball.</text></example></roleset>
+<roleset id="{verb}.02" name="other {verb}"><roles><role descr="agent" f="PAG" n="0"/></roles></roleset>
+</predicate></frameset>
+'''
+
+ON_INVENTORY = '''<?xml version="1.0" encoding="UTF-8"?>
+<inventory lemma="{verb}-v">
+<sense n="1" type="" name="move" group="1"><commentary/><examples>x</examples><mappings><wn version="2.1">1</wn><omega/><pb>{verb}.01</pb><vn>{vn_class}</vn><fn>{frame}</fn></mappings><SENSE_META clarity=""/></sense>
+<sense n="2" type="" name="other" group="2"><commentary/><examples>x</examples><mappings><wn version="2.1">2</wn><omega/><pb>{verb}.02</pb></mappings><SENSE_META clarity=""/></sense>
+</inventory>
+'''
+
+
+class Lexicon(object):
+    """The synthetic lemmas, classes and frames, and how they relate"""
+
+    def __init__(self, lemmas):
+        self.lemmas = ["verb%d" % i for i in range(lemmas)]
+        n_classes = max(1, lemmas // 5)
+        self.class_numbers = ["%d.%d" % (10 + i // 9, 1 + i % 9) for i in range(n_classes)]
+        self.class_ids = ["%s-%s" % (self.lemmas[i], number) for i, number in enumerate(self.class_numbers)]
+        # every class maps to one frame, every seventh to two, so some instances come out IN
+        n_frames = n_classes // 2 + 1
+        self.class_frames = [["Frame%d" % (i % n_frames)] + (["Frame%d" % ((i + 1) % n_frames)] if i % 7 == 0 else [])
+                             for i in range(n_classes)]
+
+    def class_of(self, lemma_no):
+        return lemma_no % len(self.class_numbers)
+
+    def vn_class(self, lemma_no):
+        """Numerical class the lemma is a member of: every fourth lemma is in the subclass"""
+        number = self.class_numbers[self.class_of(lemma_no)]
+        return number + "-1" if lemma_no % 4 == 3 else number
+
+    def frames(self, lemma_no):
+        return self.class_frames[self.class_of(lemma_no)]
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def write_verbnet(directory, lexicon, frames_per_class=4):
+    for i, class_id in enumerate(lexicon.class_ids):
+        members = [no for no in range(len(lexicon.lemmas)) if lexicon.class_of(no) == i]
+        top = "".join(VN_MEMBER.format(verb=lexicon.lemmas[no]) for no in members if no % 4 != 3)
+        sub = "".join(VN_MEMBER.format(verb=lexicon.lemmas[no]) for no in members if no % 4 == 3)
+        frames = "".join(VN_FRAME.format(verb=lexicon.lemmas[i]) for _ in range(frames_per_class))
+        write(os.path.join(directory, class_id + ".xml"),
+              VN_CLASS.format(id=class_id, members=top, submembers=sub, frames=frames))
+
+
+def write_propbank(directory, lexicon):
+    for no, verb in enumerate(lexicon.lemmas):
+        write(os.path.join(directory, verb + ".xml"),
+              PB_FRAMESET.format(verb=verb, vn_class=lexicon.vn_class(no), frame=lexicon.frames(no)[0]))
+
+
+def write_ontonotes(directory, lexicon):
+    for no, verb in enumerate(lexicon.lemmas):
+        write(os.path.join(directory, verb + "-v.xml"),
+              ON_INVENTORY.format(verb=verb, vn_class=lexicon.vn_class(no), frame=lexicon.frames(no)[0]))
+
+
+def write_mappings(paths, lexicon):
+    """vn-fn2.s, VN-FNRoleMapping.txt, external_vn2pb.json, pb-vn2.json, vn-fn2.json and the FrameNet lemma index"""
+    vn_fn = ["<verbnet-framenet_MappingData>"]
+    for no, verb in enumerate(lexicon.lemmas):
+        for frame in lexicon.frames(no):
+            vn_fn.append('  <vncls class="%s" fnframe="%s" vnmember="%s"/>' % (lexicon.vn_class(no), frame, verb))
+    write(paths["vn_fn"], "\n".join(vn_fn + ["</verbnet-framenet_MappingData>\n"]))
+
+    roles = ["<verbnetRoles-framenetFEs_RoleMappingData>"]
+    for number, frames in zip(lexicon.class_numbers, lexicon.class_frames):
+        for frame in frames:
+            roles.append('  <vncls class="%s" fnframe="%s"><roles><role fnrole="Agent" vnrole="Agent"/>'
+                         '<role fnrole="Theme" vnrole="Theme"/></roles></vncls>' % (number, frame))
+    write(paths["vn_fn_roles"], "\n".join(roles + ["</verbnetRoles-framenetFEs_RoleMappingData>\n"]))
+
+    vn2pb, pb_vn, vn_fn_json, lemma_frames = {}, {}, {}, {}
+    for no, verb in enumerate(lexicon.lemmas):
+        vn2pb.setdefault(lexicon.class_ids[lexicon.class_of(no)], []).append(verb + ".01")
+        pb_vn[verb + ".01"] = {lexicon.vn_class(no): {"ARG0": "agent", "ARG1": "theme"}}
+        vn_fn_json[lexicon.vn_class(no) + "-" + verb] = lexicon.frames(no)
+        lemma_frames[verb] = lexicon.frames(no)
+    for key, mapping in (("external_vn2pb", vn2pb), ("pb_vn", pb_vn), ("vn_fn_json", vn_fn_json),
+                         ("fn_lemmas", lemma_frames)):
+        write(paths[key], json.dumps(mapping))
+
+
+def instance(rng, lexicon, documents, sentences=50, tokens=30):
+    """A random (source file, sentence, token, lemma number)"""
+    doc = rng.randrange(documents)
+    source_file = "nw/wsj/%02d/wsj_%02d%02d.mrg" % (doc // 100, doc // 100, doc % 100)
+    return source_file, rng.randrange(sentences), rng.randrange(tokens), rng.randrange(len(lexicon.lemmas))
+
+
+def write_instances(path, lexicon, n, documents, rng):
+    """SemLink instances in various states of completeness, so that every update has something to do"""
+    lines = []
+    for _ in range(n):
+        source_file, sentence_no, token_no, no = instance(rng, lexicon, documents)
+        verb, state = lexicon.lemmas[no], rng.random()
+        vn_class = lexicon.vn_class(no) if state > 0.3 else "None"
+        fn_frame = lexicon.frames(no)[0] if state > 0.6 else rng.choice(["None", "NF", "IN"])
+        on_group = "1" if state > 0.5 else "null"
+        deps = "0:1-ARG0=Agent 2:1-ARG1=Theme" if vn_class != "None" else "0:1-ARG0 2:1-ARG1"
+        lines.append("%s %d %d gold %s-v %s %s %s.01 %s %s" % (source_file, sentence_no, token_no, verb, vn_class,
+                                                            fn_frame, verb, on_group, deps))
+    write(path, "\n".join(lines) + "\n")
+
+
+def write_release(directory, extension, lexicon, n, documents, rng, line):
+    """Annotation release laid out as directory/folder/document.extension, the way the update_*_from_release
+    methods read it. line formats the annotation of (source file, sentence, token, lemma)"""
+    docs = {}
+    for _ in range(n):
+        source_file, sentence_no, token_no, no = instance(rng, lexicon, documents)
+        docs.setdefault(source_file, []).append(line(source_file, sentence_no, token_no, lexicon.lemmas[no], no))
+    for source_file, lines in docs.items():
+        folder, name = source_file.split("/")[-2:]
+        write(os.path.join(directory, folder, name.replace(".mrg", extension)), "\n".join(lines) + "\n")
+
+
+def generate(directory, lemmas=1000, instances=50000, release_instances=None, documents=None, frames_per_class=4,
+             seed=0):
+    """Write a synthetic resource set under directory and return the paths of its parts. Releases (PB .prop,
+    ON .sense and VN annotation files) get release_instances annotations each, by default half of instances"""
+    rng = random.Random(seed)
+    lexicon = Lexicon(lemmas)
+    release_instances = instances // 2 if release_instances is None else release_instances
+    documents = documents or max(1, instances // 500)
+
+    # Directories end in a separator, since the release readers concatenate paths
+    paths = {
+        "vn": os.path.join(directory, "verbnet", ""),
+        "pb": os.path.join(directory, "propbank", ""),
+        "on": os.path.join(directory, "ontonotes", ""),
+        "vn_fn": os.path.join(directory, "vn-fn2.s"),
+        "vn_fn_roles": os.path.join(directory, "VN-FNRoleMapping.txt"),
+        "external_vn2pb": os.path.join(directory, "external_vn2pb.json"),
+        "pb_vn": os.path.join(directory, "pb-vn2.json"),
+        "vn_fn_json": os.path.join(directory, "vn-fn2.json"),
+        "fn_lemmas": os.path.join(directory, "framenet_lemmas.json"),
+        "instances": os.path.join(directory, "semlink.instances"),
+        "pb_release": os.path.join(directory, "pb_release", ""),
+        "on_release": os.path.join(directory, "on_release", ""),
+        "vn_anns": os.path.join(directory, "vn_anns", ""),
+    }
+    write_verbnet(paths["vn"], lexicon, frames_per_class)
+    write_propbank(paths["pb"], lexicon)
+    write_ontonotes(paths["on"], lexicon)
+    write_mappings(paths, lexicon)
+    write_instances(paths["instances"], lexicon, instances, documents, rng)
+
+    write_release(paths["pb_release"], ".prop", lexicon, release_instances, documents, rng,
+                  lambda f, s, t, verb, no: "%s %d %d gold %s-v %s.01 0:1-ARG0 2:1-ARG1" % (f, s, t, verb, verb))
+    write_release(paths["on_release"], ".sense", lexicon, release_instances, documents, rng,
+                  lambda f, s, t, verb, no: "%s %d %d %s-v %d" % (f, s, t, verb, 1 + no % 2))
+    vn_lines = []
+    for _ in range(release_instances):
+        source_file, sentence_no, token_no, no = instance(rng, lexicon, documents)
+        vn_lines.append("%s %d %d %s-v %s" % (source_file, sentence_no, token_no, lexicon.lemmas[no],
+                                              lexicon.class_ids[lexicon.class_of(no)]))
+    write(os.path.join(paths["vn_anns"], "vn.anns"), "\n".join(vn_lines) + "\n")
+    return paths
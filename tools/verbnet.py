@@ -9,6 +9,13 @@ verb frames.
 import os
 import bs4
 import re
+import pickle
+import hashlib
+import multiprocessing
+import weakref
+from functools import cached_property
+from collections import OrderedDict
+from collections.abc import Mapping
 import config
 
 __author__ = ["Todd Curcuru & Marc Verhagen"]
@@ -16,6 +23,15 @@ __date__ = "3/15/2016"
 __email__ = ["tcurcuru@brandeis.edu, marc@cs.brandeis.edu"]
 
 
+# Bump whenever the pickled layout of the VerbNet objects changes, so stale snapshots are rebuilt
+SNAPSHOT_FORMAT = 4
+# Classes (files) a lazy VerbNetParser keeps parsed at most
+LAZY_CACHE_SIZE = 128
+# Parsers that have built a frame index. Frames don't know their parser, so editing the predicates of any frame
+# drops the index of all of them, see frames_edited
+indexed_parsers = weakref.WeakSet()
+
+
 def get_verbnet_directory(version):
     for line in open(os.path.join(os.path.dirname(__file__), 'config.txt')):
         if line.startswith('VERBNET_PATH') and line.split("=")[0].strip().endswith(version):
@@ -27,9 +43,24 @@ class VerbNetParser(object):
     """Parse VerbNet XML files, and turn them into a list of BeautifulSoup
     objects"""
 
-    def __init__(self, max_count=None, directory=None, file_list=None, version=None):
+    def __init__(self, max_count=None, directory=None, file_list=None, version=None, cache_path=None, workers=None,
+                 lazy=False, lazy_cache_size=LAZY_CACHE_SIZE):
         """Take all verbnet files, if max_count is used then take the first max_count
-        files, if file_list is used, read the filenames from the file."""
+        files, if file_list is used, read the filenames from the file.
+
+        If cache_path is given, the parsed classes are loaded from the snapshot stored there as long as
+        the source files are unchanged, and the snapshot is (re)written after a fresh parse. Snapshot
+        objects carry attribute dicts instead of soups, so the soup editing methods (add_member,
+        remove_member, add_predicates, ...) need a parser built without a cache. Frames and thematic roles
+        not used before the snapshot was written stay deferred in it, as the XML of those two sections.
+
+        With workers > 1 the files are parsed in a pool of that many processes. Classes come back
+        without their soups, as they would from a snapshot, and parsed_files stays empty.
+
+        With lazy, the files are only scanned for their class IDs and members. A class is parsed the
+        first time it is looked up in verb_classes_dict or verb_classes_numerical_dict, and only the
+        classes of the lazy_cache_size files used last are kept (a class looked up again after that is
+        parsed again, as a new object). cache_path and workers are ignored."""
         if directory:
             VERBNET_PATH = directory
         elif version:
@@ -48,19 +79,134 @@ class VerbNetParser(object):
             fnames = ["%s.xml" % f for f in open(file_list).read().split()]
 
         self.version = version
-        self.parsed_files = self.parse_files()
+        self.cache_path = cache_path
+        self.parsed_files = []
         self.verb_classes_dict = {}
         # For lookup when classname is not available
         # As in the annotation files
         self.verb_classes_numerical_dict = {}
+        # Member name -> IDs of every class or subclass listing it, and each class ID's load order
+        self.member_index = {}
+        self.class_order = {}
+        # Numerical ID -> class ID, and class ID -> ID of the class it is a subclass of
+        self.class_ids = {}
+        self.class_parent = {}
+        # Frames by predicate, thematic role and primary syntax, built by the first search_frames
+        self.frame_index = None
+
+        self.lazy = lazy
+        if lazy:
+            self.index_files(lazy_cache_size)
+            return
+
+        if cache_path and self.load_snapshot(cache_path):
+            return
+
+        if workers and workers > 1:
+            with multiprocessing.Pool(workers) as pool:
+                classes = pool.starmap(parse_class_file, [(fname, version) for fname in self.filenames])
+            for vc in classes:
+                self.add_verb_class(vc)
+        else:
+            self.parsed_files = self.parse_files()
+            for parse in self.parsed_files:
+                self.add_verb_class(VerbClass(parse.VNCLASS, version))
+
+        if cache_path:
+            self.write_snapshot(cache_path)
+
+    def add_verb_class(self, vc):
+        """Register a top level class and all of its subclasses in the lookup dicts and the member index"""
+        for c in [vc] + vc.get_all_subclasses():
+            self.verb_classes_dict[c.ID] = c
+            self.verb_classes_numerical_dict["-".join(c.ID.split("-")[1:])] = c
+            self.class_order.setdefault(c.ID, len(self.class_order))
+            self.class_ids[c.numerical_ID] = c.ID
+            for sub in c.subclasses:
+                self.class_parent[sub.ID] = c.ID
+            for name in c.member_names:
+                self.member_index.setdefault(name, set()).add(c.ID)
+
+    def index_files(self, cache_size):
+        """Set up lazy loading: register every class ID found in the files, without parsing them"""
+        # Class ID -> file, and file -> {class ID: VerbClass} for the files parsed last, most recent at the end
+        self.class_files = {}
+        self.loaded = OrderedDict()
+        self.cache_size = cache_size
+        for fname in self.filenames:
+            for class_id, parent_id, names in scan_class_file(fname):
+                self.class_files[class_id] = fname
+                self.class_order.setdefault(class_id, len(self.class_order))
+                self.class_ids["-".join(class_id.split("-")[1:])] = class_id
+                if parent_id:
+                    self.class_parent[class_id] = parent_id
+                for name in names:
+                    self.member_index.setdefault(name, set()).add(class_id)
+        self.verb_classes_dict = LazyClassDict(self, {class_id: class_id for class_id in self.class_files})
+        self.verb_classes_numerical_dict = LazyClassDict(self, self.class_ids)
+
+    def load_class(self, class_id):
+        """The VerbClass for class_id in lazy mode, parsing its file if it isn't among the ones kept"""
+        fname = self.class_files[class_id]
+        if fname in self.loaded:
+            self.loaded.move_to_end(fname)
+        else:
+            vc = VerbClass(bs4.BeautifulSoup(open(fname), "lxml-xml").VNCLASS, self.version)
+            self.loaded[fname] = {c.ID: c for c in [vc] + vc.get_all_subclasses()}
+            if len(self.loaded) > self.cache_size:
+                self.loaded.popitem(last=False)
+        return self.loaded[fname][class_id]
+
+    def source_manifest(self, previous=None):
+        """Map every source file to its (mtime, size, sha1). Hashes from a previous manifest are reused
+        for files whose mtime and size haven't changed, so an up-to-date check only reads changed files"""
+        previous = previous or {}
+        manifest = {}
+        for fname in self.filenames:
+            stat = os.stat(fname)
+            old = previous.get(fname)
+            if old and old[0] == stat.st_mtime_ns and old[1] == stat.st_size:
+                manifest[fname] = old
+            else:
+                with open(fname, "rb") as f:
+                    manifest[fname] = (stat.st_mtime_ns, stat.st_size, hashlib.sha1(f.read()).hexdigest())
+        return manifest
+
+    def load_snapshot(self, cache_path):
+        """Populate the parser from a snapshot written by write_snapshot. Returns False if there is no
+        snapshot, or it was built from different sources or another version of this module"""
+        if not os.path.exists(cache_path):
+            return False
+        try:
+            with open(cache_path, "rb") as f:
+                header = pickle.load(f)
+                if header.get("format") != SNAPSHOT_FORMAT or header.get("version") != self.version:
+                    return False
+                # A touched but otherwise identical file still matches on its hash
+                old_manifest = header["manifest"]
+                if {fname: entry[2] for fname, entry in self.source_manifest(old_manifest).items()} != \
+                        {fname: entry[2] for fname, entry in old_manifest.items()}:
+                    return False
+                classes = pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, AttributeError, KeyError, ImportError):
+            return False
 
-        for parse in self.parsed_files:
-            vc = VerbClass(parse.VNCLASS, version)
-            self.verb_classes_dict[vc.ID] = vc
-            self.verb_classes_numerical_dict["-".join(vc.ID.split("-")[1:])] = vc
-            for sub in vc.get_all_subclasses():
-                self.verb_classes_dict[sub.ID] = sub
-                self.verb_classes_numerical_dict["-".join(sub.ID.split("-")[1:])] = sub
+        for vc in classes:
+            self.add_verb_class(vc)
+        return True
+
+    def write_snapshot(self, cache_path):
+        """Store the top level classes (subclasses are reachable through them) along with a manifest of
+        the source files. Written to a temporary file first so readers never see a partial snapshot"""
+        header = {"format": SNAPSHOT_FORMAT, "version": self.version, "manifest": self.source_manifest()}
+        subclass_ids = {sub.ID for vc in self.verb_classes_dict.values() for sub in vc.subclasses}
+        classes = [vc for vc in self.verb_classes_dict.values() if vc.ID not in subclass_ids]
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(classes, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
 
     def parse_files(self):
         """Parse a list of XML files using BeautifulSoup. Returns list of parsed
@@ -88,12 +234,10 @@ class VerbNetParser(object):
         elif type(members_list[0]) != str:
             raise Exception("get_verb_classes_by_members requires a list of Members or strings")
 
-        v_classes = []
-        for vc in self.verb_classes_dict.values():
-            if list(set(members_list) & set([m.name for m in vc.members])):
-                v_classes.append(vc)
-                continue
-        return v_classes
+        class_ids = set()
+        for name in members_list:
+            class_ids.update(self.member_index.get(name, ()))
+        return [self.verb_classes_dict[c] for c in sorted(class_ids, key=self.class_order.get)]
 
     def get_members(self, class_list=[]):
         """Return a list of members from all VerbNet classes
@@ -123,26 +267,128 @@ class VerbNetParser(object):
 
         return frames
 
+    def search_frames(self, predicates=(), themroles=(), syntax=None):
+        """Return (class, frame) pairs for the frames that match all of the given criteria, see FrameIndex.search:
+
+            vnp.search_frames(predicates=["motion(during(E), Theme)"], syntax="NP V NP PP.destination")"""
+        if self.frame_index is None:
+            # Frames are only built when a class's frames are first used, so the index waits for the first search
+            self.frame_index = FrameIndex()
+            for c in self.verb_classes_dict.values():
+                self.frame_index.add_class(c)
+            indexed_parsers.add(self)
+        # The index only holds class IDs, so in lazy mode the classes are looked up (and loaded) again here
+        return [(vc, vc.frames[n]) for vc, n in
+                ((self.verb_classes_dict[class_id], n) for class_id, n in
+                 self.frame_index.search(predicates, themroles, syntax))]
+
+    def has_member(self, vn_class, verb):
+        """Whether the class with numerical ID vn_class lists verb itself, not through a subclass"""
+        return self.class_ids.get(vn_class) in self.member_index.get(verb, ())
+
+    def is_subclass_of(self, class_id, ancestor_id):
+        """Whether class_id is ancestor_id or one of its subclasses, at any depth"""
+        while class_id is not None:
+            if class_id == ancestor_id:
+                return True
+            class_id = self.class_parent.get(class_id)
+        return False
+
+    def find_member_subclass(self, vn_class, verb):
+        """Return the numerical ID of the first of vn_class and its subclasses that has verb as a member,
+        or False. vn_class must be a numerical ID in verb_classes_numerical_dict"""
+        member_of = self.member_index.get(verb)
+        if not member_of:
+            return False
+        ancestor_id = self.class_ids[vn_class]
+        # Classes are ordered as they are in the file, so the first match is the first one depth first
+        for class_id in sorted(member_of, key=self.class_order.get):
+            if self.is_subclass_of(class_id, ancestor_id):
+                return "-".join(class_id.split("-")[1:])
+        return False
+
     def find_correct_subclass(self, vn_class, verb):
         if not vn_class:
             return False
-        if vn_class in self.verb_classes_numerical_dict:
-            if verb in [m.name for m in self.verb_classes_numerical_dict[vn_class].members]:
+        if vn_class in self.class_ids:
+            if self.has_member(vn_class, verb):
                 return vn_class
         else:
-            if vn_class.split("-")[0] in self.verb_classes_numerical_dict:
+            if vn_class.split("-")[0] in self.class_ids:
                 vn_class = vn_class.split("-")[0]
-            elif vn_class.split(".")[0] in self.verb_classes_numerical_dict:
+            elif vn_class.split(".")[0] in self.class_ids:
                 vn_class = vn_class.split(".")[0]
-            elif vn_class + ".1" in self.verb_classes_numerical_dict:
+            elif vn_class + ".1" in self.class_ids:
                 vn_class = vn_class + ".1"
             else:
                 return False
 
-        for subclass in [self.verb_classes_numerical_dict[vn_class]] + self.verb_classes_numerical_dict[vn_class].get_all_subclasses():
-            if verb in [m.name for m in subclass.get_members()]:
-                return subclass.numerical_ID
-        return False
+        return self.find_member_subclass(vn_class, verb)
+
+class LazyClassDict(Mapping):
+    """verb_classes_dict and verb_classes_numerical_dict of a lazy VerbNetParser: maps a key to its class ID, and
+    returns the class from the parser, which parses it if needed"""
+
+    def __init__(self, parser, class_ids):
+        self.parser = parser
+        self.class_ids = class_ids
+
+    def __getitem__(self, key):
+        return self.parser.load_class(self.class_ids[key])
+
+    def __contains__(self, key):
+        return key in self.class_ids
+
+    def __iter__(self):
+        return iter(self.class_ids)
+
+    def __len__(self):
+        return len(self.class_ids)
+
+
+CLASS_TAG = re.compile(r'<(/?)(VNCLASS|VNSUBCLASS|MEMBER)\b([^>]*)>')
+COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+ATTRIBUTE = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+
+def scan_class_file(fname):
+    """Read the class and subclass IDs of a VerbNet file and their member names with a regex instead of an XML
+    parser. Returns (class ID, parent class ID or None, member names) in the order they appear in the file.
+    Commented out XML is skipped, and a VNCLASS without an ID takes that of its first VNSUBCLASS, like VerbClass"""
+    with open(fname, encoding="utf-8") as f:
+        text = COMMENT.sub("", f.read())
+    classes, open_classes, unnamed = [], [], []
+    for closing, tag, attributes in CLASS_TAG.findall(text):
+        if tag == "MEMBER":
+            if not closing and open_classes:
+                attrs = {name: a or b for name, a, b in ATTRIBUTE.findall(attributes)}
+                if attrs.get("name", "").split():
+                    open_classes[-1][2].append(attrs["name"].split()[0])
+        elif closing:
+            open_classes.pop()
+        else:
+            attrs = {name: a or b for name, a, b in ATTRIBUTE.findall(attributes)}
+            class_id = attrs.get("ID", "").split()[:1]
+            if tag == "VNSUBCLASS" and class_id:
+                for entry in unnamed:
+                    entry[0] = class_id[0]
+                unnamed = []
+            entry = [class_id[0] if class_id else None, open_classes[-1][0] if open_classes else None, []]
+            if entry[0] is None:
+                unnamed.append(entry)
+            classes.append(entry)
+            if not attributes.rstrip().endswith("/"):
+                open_classes.append(entry)
+    if unnamed:
+        raise ValueError("%s has a class without an ID or a subclass to take it from" % fname)
+    return [tuple(entry) for entry in classes]
+
+
+def parse_class_file(fname, version=None):
+    """Parse a single VerbNet file into its top level VerbClass. Used by the worker pool, the class is
+    pickled back without its soup"""
+    return VerbClass(bs4.BeautifulSoup(open(fname), "lxml-xml").VNCLASS, version)
+
 
 class AbstractXML(object):
     """Abstract class to be inherited by other classes that share the same
@@ -232,6 +478,13 @@ class AbstractXML(object):
         indent = re.compile(r'^(\s*)', re.MULTILINE)
         return indent.sub(r'\1' * 4, self.soup.prettify())
 
+    def __getstate__(self):
+        """Pickle without the soup: only its attributes are kept, which is all get_category needs"""
+        state = self.__dict__.copy()
+        if isinstance(state.get("soup"), bs4.element.Tag):
+            state["soup"] = dict(state["soup"].attrs)
+        return state
+
 
 class VerbClass(AbstractXML):
     """Represents a single class of verbs in VerbNet (all verbs from the same
@@ -247,10 +500,39 @@ class VerbClass(AbstractXML):
         self.version = version
         self.numerical_ID = "-".join(self.ID.split("-")[1:])
         self.members = self._members()
-        self.frames = self._frames()
-        self.names = [mem.get_category('name')[0] for mem in self.members]
-        self.themroles = self._themroles()
+        self.member_names = frozenset(mem.name for mem in self.members)
         self.subclasses = self._subclass()
+        self._all_subclasses = None
+
+    # frames, themroles and names are built on first use, most lookups only need members and subclasses
+    @cached_property
+    def frames(self):
+        return self._frames()
+
+    @cached_property
+    def themroles(self):
+        return self._themroles()
+
+    @cached_property
+    def names(self):
+        return [mem.get_category('name')[0] for mem in self.members]
+
+    def deferred_soup(self):
+        """The soup frames and themroles are built from: the class's own, or once pickled, one parsed from the
+        XML of its FRAMES and THEMROLES that __getstate__ kept"""
+        if isinstance(self.soup, bs4.element.Tag):
+            return self.soup
+        return bs4.BeautifulSoup(self.deferred_xml, "lxml-xml").find(self.soup_name)
+
+    def __getstate__(self):
+        """Pickle without the soup. Frames and themroles that haven't been built yet are kept as the XML of their
+        sections rather than built now, so a snapshot or a worker doesn't build every class's frames"""
+        state = super().__getstate__()
+        if "frames" not in state or "themroles" not in state:
+            soup = self.deferred_soup()
+            state["soup_name"] = soup.name
+            state["deferred_xml"] = "<%s>%s%s</%s>" % (soup.name, soup.THEMROLES or "", soup.FRAMES or "", soup.name)
+        return state
 
     def __repr__(self):
         return str(self.ID) + "\n" + str([mem.__repr__() for mem in self.members]) \
@@ -322,7 +604,7 @@ class VerbClass(AbstractXML):
     def _frames(self):
         """Get all frames for a verb class, seems to be shared by all members
         of the class."""
-        return [Frame(frame_soup, self.ID, self.version) for frame_soup in self.soup.FRAMES.find_all("FRAME")]
+        return [Frame(frame_soup, self.ID, self.version) for frame_soup in self.deferred_soup().FRAMES.find_all("FRAME")]
 
     def frames_and_subclass_frames(self):
         return [Frame(frame_soup, self.ID, self.version) for frame_soup in self.soup.find_all("FRAME")]
@@ -330,7 +612,8 @@ class VerbClass(AbstractXML):
     def _themroles(self):
         """Get all the thematic roles for a verb class ans their selectional
         restrictions."""
-        return [ThematicRole(them_soup, self.version) for them_soup in self.soup.THEMROLES.find_all("THEMROLE")]
+        return [ThematicRole(them_soup, self.version) for them_soup in
+                self.deferred_soup().THEMROLES.find_all("THEMROLE")]
 
     def _subclass(self):
         """Get every subclass listed, if any"""
@@ -341,6 +624,12 @@ class VerbClass(AbstractXML):
                 self.soup.SUBCLASSES.find_all("VNSUBCLASS", recursive=False)]
 
     def get_all_subclasses(self):
+        """All subclasses, depth first. The flattened list is computed once and copied on return"""
+        if self._all_subclasses is None:
+            self._all_subclasses = self._flatten_subclasses()
+        return list(self._all_subclasses)
+
+    def _flatten_subclasses(self):
         def get_subclasses_gen(vc):
             for sub in vc.subclasses:
                 if sub.subclasses:
@@ -514,6 +803,7 @@ class Frame(AbstractXML):
 
     def _reset_preds(self):
         self.predicates = [Predicate(pred, self.version) for pred in self.soup.SEMANTICS.find_all("PRED")]
+        frames_edited()
 
 
 class ThematicRole(AbstractXML):
@@ -605,6 +895,11 @@ class Predicate(AbstractXML):
         self.argtypes = [(self.get_category('type', arg)[0],
                           self.get_category('value', arg)[0]) for arg in self.args]
 
+    def __getstate__(self):
+        state = super().__getstate__()
+        state["args"] = [dict(arg.attrs) if isinstance(arg, bs4.element.Tag) else arg for arg in self.args]
+        return state
+
     def __str__(self):
         return "%s(%s)" % (self.value[0], ', '.join([at[1] for at in self.argtypes]))
 
@@ -614,17 +909,18 @@ class Predicate(AbstractXML):
     def contains(self, input):
         '''
             input: a Predicate object, or a BeatifulSoup result set,
-            which is the return type of predicate.args
+            which is the return type of predicate.args (a plain list for snapshot-loaded predicates)
         '''
-        if type(input) == bs4.element.ResultSet:
+        if isinstance(input, list):
             search_args = input
         elif type(input) == Predicate:
             search_args = input.args
         else:
             raise Exception(str(type(input)) + " is not a valid input type")
 
-        # Hacky way to ignore question marks (?) in arg values
-        argtypes = [(argtype[0].replace('?', ''), argtype[1].replace('?', '')) for argtype in self.argtypes]
+        argtypes = self.plain_argtypes()
+        if type(input) == Predicate:
+            return all(argtype in argtypes for argtype in input.plain_argtypes())
 
         for search_arg in search_args:
             # Use the same hacky way to ignore question marks (?) in arg values
@@ -635,6 +931,14 @@ class Predicate(AbstractXML):
         # This will also return if there were no input preds to loop over
         return True
 
+    def plain_argtypes(self):
+        """The argtypes with question marks (?) removed, as a set. Computed once, _reset_args clears it"""
+        if getattr(self, "_plain_argtypes", None) is None:
+            # Hacky way to ignore question marks (?) in arg values
+            self._plain_argtypes = frozenset((argtype[0].replace('?', ''), argtype[1].replace('?', ''))
+                                             for argtype in self.argtypes)
+        return self._plain_argtypes
+
     def add_args(self, add_args, order="first"):
         """
         Add an ARG to a predicate
@@ -673,6 +977,8 @@ class Predicate(AbstractXML):
         return removed
 
     def _reset_args(self):
+        self._plain_argtypes = None
+        frames_edited()
         self.args = self.soup.find_all('ARG')
         self.argtypes = [(self.get_category('type', arg)[0],
                           self.get_category('value', arg)[0]) for arg in self.args]
@@ -713,6 +1019,110 @@ class SyntacticRole(AbstractXML):
                     + "\tRestrs: " + str(self.restrictions)
 
 
+def normalize_syntax(syntax):
+    """Primary syntax as a single space separated string, from a string or the token list in Frame.primary"""
+    if isinstance(syntax, str):
+        syntax = syntax.split()
+    return " ".join(syntax)
+
+
+def parse_predicate(predicate):
+    """Split "motion(during(E), ?Theme)" into its value and arg values ("motion", ["during(E)", "Theme"]), with
+    question marks removed. A Predicate object gives its own value and arg values"""
+    if isinstance(predicate, Predicate):
+        return predicate.value[0], [value for _, value in predicate.plain_argtypes()]
+    predicate = predicate.strip()
+    if "(" not in predicate:
+        return predicate, []
+    value, args = predicate[:predicate.index("(")].strip(), predicate[predicate.index("(") + 1:predicate.rindex(")")]
+    # Split on the commas that aren't inside an arg like during(E)
+    arg_values, depth, start = [], 0, 0
+    for i, c in enumerate(args):
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "," and depth == 0:
+            arg_values.append(args[start:i])
+            start = i + 1
+    arg_values.append(args[start:])
+    return value, [arg.strip().replace("?", "") for arg in arg_values if arg.strip()]
+
+
+def frames_edited():
+    """Drop the frame indexes built before a frame's predicates changed, the next search_frames rebuilds them"""
+    for parser in list(indexed_parsers):
+        parser.frame_index = None
+    indexed_parsers.clear()
+
+
+class FrameIndex(object):
+    """Frames of a set of VerbNet classes, indexed by semantic predicate, by predicate and arg value, by the
+    thematic roles they use (in their syntax or as predicate args) and by primary syntax. A search intersects the
+    frame sets of its criteria instead of looking at every frame"""
+
+    def __init__(self):
+        # Frame number -> (class ID, position in the class's frames), in load order. Holding IDs rather than the
+        # objects lets the classes of a lazy parser be dropped from its cache
+        self.frames = []
+        # Predicate value -> frame numbers
+        self.predicates = {}
+        # (predicate value, arg value) -> (frame number, predicate number), so that all args of a search predicate
+        # are matched on the same predicate of a frame
+        self.predicate_args = {}
+        self.themroles = {}
+        self.syntax = {}
+
+    def add_class(self, vc):
+        """Index the frames of vc itself, its subclasses are added separately"""
+        for position, frame in enumerate(vc.frames):
+            n = len(self.frames)
+            self.frames.append((vc.ID, position))
+            for p, pred in enumerate(frame.predicates):
+                self.predicates.setdefault(pred.value[0], set()).add(n)
+                for argtype, value in pred.plain_argtypes():
+                    self.predicate_args.setdefault((pred.value[0], value), set()).add((n, p))
+                    if argtype == "ThemRole":
+                        self.themroles.setdefault(value, set()).add(n)
+            for role in frame.syntax:
+                if role.POS == "NP" and role.value:
+                    self.themroles.setdefault(role.value[0].replace("?", ""), set()).add(n)
+            self.syntax.setdefault(normalize_syntax(frame.primary), set()).add(n)
+
+    def predicate_frames(self, predicate):
+        value, args = parse_predicate(predicate)
+        if not args:
+            return self.predicates.get(value, set())
+        matches = None
+        for arg in args:
+            pairs = self.predicate_args.get((value, arg), set())
+            matches = pairs if matches is None else matches & pairs
+            if not matches:
+                return set()
+        return {n for n, _ in matches}
+
+    def search(self, predicates=(), themroles=(), syntax=None):
+        """Return (class ID, frame position) pairs, in load order, for the frames that have every predicate (a string like
+        "motion(during(E), Theme)", just "motion", or a Predicate; args are matched on their value), use every
+        thematic role and have the primary syntax given. Without any criteria all frames are returned"""
+        if isinstance(predicates, (str, Predicate)):
+            predicates = [predicates]
+        if isinstance(themroles, str):
+            themroles = [themroles]
+        frame_sets = [self.predicate_frames(predicate) for predicate in predicates]
+        frame_sets += [self.themroles.get(role.replace("?", ""), set()) for role in themroles]
+        if syntax is not None:
+            frame_sets.append(self.syntax.get(normalize_syntax(syntax), set()))
+        if not frame_sets:
+            return list(self.frames)
+        # Smallest set first, so the intersection stays small
+        frame_sets.sort(key=len)
+        matches = set(frame_sets[0])
+        for frames in frame_sets[1:]:
+            matches &= frames
+        return [self.frames[n] for n in sorted(matches)]
+
+
 def search(verbclasslist, pred_type=None, themroles=None, synroles=None, semroles=None):
     """Returns frames for verbclasses that match search parameters
     TODO: figure out what it means to search for themroles, synroles, and semroles"""
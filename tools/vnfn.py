@@ -1,4 +1,3 @@
-from nltk.corpus import framenet
 from lxml import etree
 import datetime
 import json
@@ -8,16 +7,42 @@ import config
 
 VN_LOC = config.VN_RESOURCE_PATH
 
-vn = verbnet.VerbNetParser(directory=VN_LOC)
-possible_classes = {"-".join(c.split("-")[1:]): [m.name for m in vn.verb_classes_dict[c].members] for c in
-                    vn.verb_classes_dict}
+# Validation tables for Mapping.verify, built on first use. Call use_verbnet to build them from a parser
+# that is already loaded instead of parsing VerbNet again
+vn = None
+possible_classes = None
+possible_frames = None
 
-possible_frames = {}
-for lu in framenet.lus():
-    if lu.frame.name not in possible_frames:
-        possible_frames[lu.frame.name] = [lu.lexemes[0].name]
-    else:
-        possible_frames[lu.frame.name].append(lu.lexemes[0].name)
+
+def use_verbnet(vn_parser):
+    global vn, possible_classes
+    vn, possible_classes = vn_parser, None
+
+
+def get_possible_classes():
+    """VN class (numerical ID) -> names of its members"""
+    global vn, possible_classes
+    if possible_classes is None:
+        if vn is None:
+            vn = verbnet.VerbNetParser(directory=VN_LOC, cache_path=config.VN_CACHE_PATH)
+        possible_classes = {"-".join(c.split("-")[1:]): [m.name for m in vn.verb_classes_dict[c].members] for c in
+                            vn.verb_classes_dict}
+    return possible_classes
+
+
+def get_possible_frames():
+    """FN frame name -> first lexeme of each of its LUs"""
+    global possible_frames
+    if possible_frames is None:
+        from nltk.corpus import framenet
+
+        possible_frames = {}
+        for lu in framenet.lus():
+            if lu.frame.name not in possible_frames:
+                possible_frames[lu.frame.name] = [lu.lexemes[0].name]
+            else:
+                possible_frames[lu.frame.name].append(lu.lexemes[0].name)
+    return possible_frames
 
 
 class Mapping():
@@ -25,7 +50,14 @@ class Mapping():
         self.member = member
         self.vn_class = vn_class
         self.fn_frame = fn_frame
-        self.errors = self.verify()
+        self._errors = None
+
+    @property
+    def errors(self):
+        """Problems found by verify, computed the first time they are asked for"""
+        if self._errors is None:
+            self._errors = self.verify()
+        return self._errors
 
     def __str__(self):
         return self.member + " " + self.vn_class + " " + self.fn_frame
@@ -51,6 +83,7 @@ class Mapping():
         return out_node
 
     def verify(self):
+        possible_classes, possible_frames = get_possible_classes(), get_possible_frames()
         res = []
         if self.vn_class not in possible_classes.keys():
             res.append("class doesn't exits")